@@ -1,23 +1,201 @@
 # -*- coding: utf-8 -*-
-from flask import Flask, render_template, request, jsonify, send_file, Response
-from datetime import datetime, date
+from flask import Flask, render_template, request, jsonify, send_file, Response, g, has_request_context
+from datetime import datetime, date, timedelta
 import sqlite3
-import json
+import click
+import gzip
+import hashlib
+import io
+import multiprocessing
 import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
 
 app = Flask(__name__)
-DB_PATH = 'data/alquileres.db'
+DB_PATH = 'data/alquileres.db'          # shard del portafolio principal
+PORTAFOLIOS_DIR = 'data/portafolios'    # un <slug>.db por portafolio adicional
+PORTAFOLIO_PRINCIPAL = 'principal'
+POOL_SHARDS = int(os.environ.get('POOL_SHARDS', 16))            # shards con conexiones abiertas
+POOL_CONEXIONES = int(os.environ.get('POOL_CONEXIONES', 4))     # conexiones libres por shard
+CACHE_DIR = 'data/cache'
+ARCHIVO_DIR = 'data/archivo'
+BACKUP_DIR = 'data/backups'
+BACKUP_PAGINAS = 64       # páginas copiadas por paso de la API de backup
+BACKUP_PAUSA = 0.005      # segundos entre pasos (los escritores avanzan acá)
+BACKUP_RETENCION = int(os.environ.get('BACKUP_RETENCION', 14))
+BACKUP_INTERVALO_HORAS = float(os.environ.get('BACKUP_INTERVALO_HORAS', 0))  # 0 = desactivado
+
+# Tablas cuyas escrituras incrementan su contador en `versiones` (vía triggers)
+TABLAS_VERSIONADAS = ('propiedades', 'ocupaciones', 'gastos', 'alquileres_mensuales')
+TABLAS_PRESENTACION = ('propiedades', 'ocupaciones', 'gastos')
+# Tablas que `archivar` mueve por año -> condición que selecciona las filas de un año
+TABLAS_ARCHIVABLES = {
+    'ocupaciones': "strftime('%Y', fecha) = ?",
+    'gastos': "strftime('%Y', fecha) = ?",
+    'alquileres_mensuales': 'año = ?',
+}
+
+# === PORTAFOLIOS (un archivo SQLite por portafolio) ===
+
+SLUG_PORTAFOLIO = re.compile(r'^[a-z0-9][a-z0-9_-]{0,39}$')
+
+def ruta_db(portafolio):
+    if portafolio == PORTAFOLIO_PRINCIPAL:
+        return DB_PATH
+    return os.path.join(PORTAFOLIOS_DIR, f'{portafolio}.db')
+
+def directorio_portafolio(base, portafolio):
+    """Subdirectorio de caches, archivos y backups de cada portafolio."""
+    return base if portafolio == PORTAFOLIO_PRINCIPAL else os.path.join(base, portafolio)
+
+def portafolio_existe(portafolio):
+    return portafolio == PORTAFOLIO_PRINCIPAL or (
+        bool(SLUG_PORTAFOLIO.match(portafolio)) and os.path.exists(ruta_db(portafolio)))
+
+def listar_portafolios():
+    otros = []
+    if os.path.isdir(PORTAFOLIOS_DIR):
+        otros = sorted(n[:-3] for n in os.listdir(PORTAFOLIOS_DIR)
+                       if n.endswith('.db') and SLUG_PORTAFOLIO.match(n[:-3]))
+    return [PORTAFOLIO_PRINCIPAL] + otros
+
+def portafolio_actual():
+    if has_request_context():
+        return g.get('portafolio', PORTAFOLIO_PRINCIPAL)
+    return PORTAFOLIO_PRINCIPAL
+
+class _Conexion(sqlite3.Connection):
+    """Conexión que al cerrarse vuelve al pool de su shard."""
+    shard = None
+    en_pool = False
+    
+    def close(self):
+        if self.shard is None:
+            super().close()
+        elif not self.en_pool:
+            _devolver_conexion(self)
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
+_pool = OrderedDict()  # ruta -> [conexiones libres], en orden LRU
+_pool_lock = threading.Lock()
+_shards_inicializados = set()
+_init_lock = threading.Lock()
+
+def _devolver_conexion(conn):
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        for db in conn.execute('PRAGMA database_list').fetchall():
+            if db['name'] not in ('main', 'temp'):
+                conn.execute(f'DETACH DATABASE {db["name"]}')
+    except sqlite3.Error:
+        sqlite3.Connection.close(conn)
+        return
+    
+    cerrar = []
+    with _pool_lock:
+        libres = _pool.setdefault(conn.shard, [])
+        _pool.move_to_end(conn.shard)
+        if len(libres) < POOL_CONEXIONES:
+            conn.en_pool = True
+            libres.append(conn)
+        else:
+            cerrar.append(conn)
+        # Cerrar los shards menos usados
+        while len(_pool) > POOL_SHARDS:
+            cerrar += _pool.popitem(last=False)[1]
+    for c in cerrar:
+        sqlite3.Connection.close(c)
+
+def get_db(portafolio=None):
+    portafolio = portafolio or portafolio_actual()
+    ruta = ruta_db(portafolio)
+    if ruta not in _shards_inicializados:
+        # Inicialización diferida: cada proceso aplica el esquema la primera vez que usa el shard
+        with _init_lock:
+            if ruta not in _shards_inicializados:
+                _shards_inicializados.add(ruta)
+                try:
+                    init_db(portafolio)
+                except Exception:
+                    _shards_inicializados.discard(ruta)
+                    raise
+    
+    with _pool_lock:
+        libres = _pool.get(ruta)
+        if libres is not None:
+            _pool.move_to_end(ruta)
+            if libres:
+                conn = libres.pop()
+                conn.en_pool = False
+                return conn
+    
+    # uri=True permite adjuntar los archivos anuales en modo solo lectura
+    conn = sqlite3.connect(ruta, uri=True, factory=_Conexion, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    # Que INSERT OR REPLACE dispare los triggers de borrado (índice de búsqueda)
+    conn.execute('PRAGMA recursive_triggers = ON')
+    conn.shard = ruta
     return conn
 
-def init_db():
-    os.makedirs('data', exist_ok=True)
-    conn = get_db()
+def get_db_lectura(portafolio=PORTAFOLIO_PRINCIPAL):
+    """Conexión de solo lectura (para procesos de reportes en paralelo)."""
+    conn = sqlite3.connect(f'file:{ruta_db(portafolio)}?mode=ro', uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def crear_indices_busqueda(c, esquema='main', reconstruir=False):
+    """Tablas FTS5 sobre ocupaciones.notas y gastos.descripcion (rowid = id)."""
+    existentes = {r[0] for r in c.execute(f"SELECT name FROM {esquema}.sqlite_master WHERE type = 'table'")}
+    for tabla, columnas in (('ocupaciones', 'notas'), ('gastos', 'descripcion, categoria')):
+        fts = f'{tabla}_fts'
+        if fts not in existentes:
+            c.execute(f'''CREATE VIRTUAL TABLE {esquema}.{fts} USING fts5(
+                {columnas}, tokenize = 'unicode61 remove_diacritics 2'
+            )''')
+        elif reconstruir:
+            c.execute(f'DELETE FROM {esquema}.{fts}')
+        else:
+            continue
+        c.execute(f'INSERT INTO {esquema}.{fts} (rowid, {columnas}) SELECT id, {columnas} FROM {esquema}.{tabla}')
+
+def nuevo_grupo():
+    return uuid.uuid4().hex
+
+def nueva_epoca():
+    return uuid.uuid4().int & 0xFFFFFFFF
+
+def init_db(portafolio=PORTAFOLIO_PRINCIPAL):
+    os.makedirs(os.path.dirname(ruta_db(portafolio)), exist_ok=True)
+    _shards_inicializados.add(ruta_db(portafolio))
+    conn = get_db(portafolio)
+    # WAL: los lectores (incluido el backup) no bloquean a los escritores
+    conn.execute('PRAGMA journal_mode=WAL')
     c = conn.cursor()
     
+    # Las tablas que se archivan usan AUTOINCREMENT: los ids de un año archivado no
+    # se reutilizan en main. Las bases anteriores se reconstruyen una sola vez.
+    sin_autoincrement = []
+    for tabla in TABLAS_ARCHIVABLES:
+        fila = c.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)).fetchone()
+        if fila and 'AUTOINCREMENT' not in fila['sql'].upper():
+            if not sin_autoincrement:
+                c.execute('BEGIN IMMEDIATE')
+            c.execute(f'ALTER TABLE {tabla} RENAME TO {tabla}_sin_autoincrement')
+            sin_autoincrement.append(tabla)
+    
     c.execute('''CREATE TABLE IF NOT EXISTS propiedades (
         id INTEGER PRIMARY KEY,
         nombre TEXT UNIQUE,
@@ -26,19 +204,20 @@ def init_db():
     )''')
     
     c.execute('''CREATE TABLE IF NOT EXISTS ocupaciones (
-        id INTEGER PRIMARY KEY,
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
         propiedad_id INTEGER,
         fecha DATE,
         precio REAL,
         origen TEXT,
         notas TEXT,
+        grupo TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (propiedad_id) REFERENCES propiedades(id),
         UNIQUE(propiedad_id, fecha)
     )''')
     
     c.execute('''CREATE TABLE IF NOT EXISTS gastos (
-        id INTEGER PRIMARY KEY,
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
         propiedad_id INTEGER,
         fecha DATE,
         monto REAL,
@@ -50,7 +229,7 @@ def init_db():
     
     # Tabla para alquileres mensuales (Brickell, locales)
     c.execute('''CREATE TABLE IF NOT EXISTS alquileres_mensuales (
-        id INTEGER PRIMARY KEY,
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
         propiedad_id INTEGER,
         año INTEGER,
         mes INTEGER,
@@ -61,6 +240,53 @@ def init_db():
         UNIQUE(propiedad_id, año, mes)
     )''')
     
+    if sin_autoincrement:
+        archivos = []
+        if c.execute("SELECT 1 FROM sqlite_master WHERE name = 'anios_archivados'").fetchone():
+            archivos = [r['archivo'] for r in c.execute('SELECT archivo FROM anios_archivados')]
+        for tabla in sin_autoincrement:
+            nuevas = {r['name'] for r in c.execute(f'PRAGMA table_info({tabla})')}
+            cols = ', '.join(r['name'] for r in c.execute(f'PRAGMA table_info({tabla}_sin_autoincrement)')
+                             if r['name'] in nuevas)
+            c.execute(f'INSERT INTO {tabla} ({cols}) SELECT {cols} FROM {tabla}_sin_autoincrement')
+            c.execute(f'DROP TABLE {tabla}_sin_autoincrement')
+            # La secuencia sigue después del mayor id, también de los años ya archivados
+            maximo = c.execute(f'SELECT COALESCE(MAX(id), 0) FROM {tabla}').fetchone()[0]
+            for archivo in archivos:
+                try:
+                    a = sqlite3.connect(f'file:{archivo}?mode=ro', uri=True)
+                    try:
+                        maximo = max(maximo, a.execute(f'SELECT COALESCE(MAX(id), 0) FROM {tabla}').fetchone()[0])
+                    finally:
+                        a.close()
+                except sqlite3.Error:
+                    pass
+            c.execute('DELETE FROM sqlite_sequence WHERE name = ?', (tabla,))
+            c.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (tabla, maximo))
+        conn.commit()
+    
+    # Estadías: las noches cargadas juntas comparten `grupo`
+    if 'grupo' not in {r['name'] for r in c.execute('PRAGMA table_info(ocupaciones)')}:
+        c.execute('ALTER TABLE ocupaciones ADD COLUMN grupo TEXT')
+    # Las noches sin estadía (anteriores a la columna, o copiadas al reconstruir la tabla)
+    # se agrupan por consecutivas con igual propiedad, inquilino y origen
+    if c.execute('SELECT 1 FROM ocupaciones WHERE grupo IS NULL LIMIT 1').fetchone():
+        asignaciones, anterior, grupo = [], None, None
+        for r in c.execute('SELECT id, propiedad_id, fecha, origen, notas FROM ocupaciones '
+                           'WHERE grupo IS NULL ORDER BY propiedad_id, fecha').fetchall():
+            try:
+                fecha = date.fromisoformat(r['fecha'])
+            except (TypeError, ValueError):
+                fecha = None
+            if not (anterior and fecha and anterior[1] and (fecha - anterior[1]).days == 1
+                    and (r['propiedad_id'], r['origen'], r['notas']) == anterior[0]):
+                grupo = nuevo_grupo()
+            asignaciones.append((grupo, r['id']))
+            anterior = ((r['propiedad_id'], r['origen'], r['notas']), fecha)
+        c.executemany('UPDATE ocupaciones SET grupo = ? WHERE id = ?', asignaciones)
+    c.execute('CREATE INDEX IF NOT EXISTS idx_ocupaciones_grupo ON ocupaciones(grupo)')
+    
+    # Propiedades iniciales del portafolio principal; los demás empiezan vacíos
     propiedades = [
         ('TIDES 14 B', 'temporario'),
         ('TIDES 5 L', 'temporario'),
@@ -71,21 +297,321 @@ def init_db():
         ('Local 1', 'mensual'),
         ('Local 2', 'mensual'),
     ]
-    for nombre, tipo in propiedades:
+    for nombre, tipo in (propiedades if portafolio == PORTAFOLIO_PRINCIPAL else []):
         c.execute('INSERT OR IGNORE INTO propiedades (nombre, tipo) VALUES (?, ?)', (nombre, tipo))
     
-    # Actualizar tipos existentes
-    c.execute("UPDATE propiedades SET tipo = 'temporario' WHERE nombre LIKE 'TIDES%'")
-    c.execute("UPDATE propiedades SET tipo = 'mensual' WHERE nombre IN ('Brickell', 'Local 1', 'Local 2')")
+    # Años cerrados movidos a data/archivo/alquileres_<año>.db
+    c.execute('''CREATE TABLE IF NOT EXISTS anios_archivados (
+        anio INTEGER PRIMARY KEY,
+        archivo TEXT,
+        archivado_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    
+    # Versiones de datos: cada escritura incrementa el contador de su tabla
+    c.execute('''CREATE TABLE IF NOT EXISTS versiones (
+        tabla TEXT PRIMARY KEY,
+        version INTEGER DEFAULT 0
+    )''')
+    # 'epoca' cambia al restaurar un backup: los contadores vuelven atrás y sin ella
+    # repetirían versiones (y ETags) que ya se usaron con otros datos
+    c.execute("INSERT OR IGNORE INTO versiones (tabla, version) VALUES ('epoca', ?)", (nueva_epoca(),))
+    for tabla in TABLAS_VERSIONADAS:
+        c.execute('INSERT OR IGNORE INTO versiones (tabla, version) VALUES (?, 0)', (tabla,))
+        for evento in ('INSERT', 'UPDATE', 'DELETE'):
+            c.execute(f'''CREATE TRIGGER IF NOT EXISTS {tabla}_version_{evento.lower()}
+                AFTER {evento} ON {tabla}
+                BEGIN
+                    UPDATE versiones SET version = version + 1 WHERE tabla = '{tabla}';
+                END''')
+    
+    # Versión por propiedad de las ocupaciones (feeds ICS)
+    c.execute('''CREATE TABLE IF NOT EXISTS versiones_propiedad (
+        propiedad_id INTEGER PRIMARY KEY,
+        version INTEGER DEFAULT 0
+    )''')
+    for evento, filas in (('INSERT', ('NEW',)), ('UPDATE', ('OLD', 'NEW')), ('DELETE', ('OLD',))):
+        cuerpo = ''.join(f'''
+                    INSERT INTO versiones_propiedad (propiedad_id, version) VALUES ({f}.propiedad_id, 1)
+                    ON CONFLICT(propiedad_id) DO UPDATE SET version = version + 1;''' for f in filas)
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS ocupaciones_version_propiedad_{evento.lower()}
+                AFTER {evento} ON ocupaciones
+                BEGIN{cuerpo}
+                END''')
+    
+    # Búsqueda de texto completo, sincronizada por triggers
+    crear_indices_busqueda(c)
+    for tabla, columnas in (('ocupaciones', 'notas'), ('gastos', 'descripcion, categoria')):
+        nuevos = ', '.join(f'NEW.{col.strip()}' for col in columnas.split(','))
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {tabla}_fts_insert AFTER INSERT ON {tabla}
+            BEGIN
+                INSERT INTO {tabla}_fts (rowid, {columnas}) VALUES (NEW.id, {nuevos});
+            END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {tabla}_fts_delete AFTER DELETE ON {tabla}
+            BEGIN
+                DELETE FROM {tabla}_fts WHERE rowid = OLD.id;
+            END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS {tabla}_fts_update AFTER UPDATE OF {columnas} ON {tabla}
+            BEGIN
+                DELETE FROM {tabla}_fts WHERE rowid = OLD.id;
+                INSERT INTO {tabla}_fts (rowid, {columnas}) VALUES (NEW.id, {nuevos});
+            END''')
+    
+    # Actualizar tipos existentes (solo si cambian, para no invalidar caches)
+    if portafolio == PORTAFOLIO_PRINCIPAL:
+        c.execute("UPDATE propiedades SET tipo = 'temporario' WHERE nombre LIKE 'TIDES%' AND tipo != 'temporario'")
+        c.execute("UPDATE propiedades SET tipo = 'mensual' WHERE nombre IN ('Brickell', 'Local 1', 'Local 2') AND tipo != 'mensual'")
     
     conn.commit()
     conn.close()
 
-init_db()
+# Los hijos del pool de reportes importan este módulo: el esquema ya lo preparó el padre,
+# y tomar el lock de escritura acá fallaría mientras corre una importación o un archivado
+if multiprocessing.parent_process() is None:
+    init_db()
+
+class PortafolioMiddleware:
+    """Convierte /p/<portafolio>/<ruta> en /<ruta>, anotando el portafolio en el environ."""
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+    
+    def __call__(self, environ, start_response):
+        partes = environ.get('PATH_INFO', '').split('/', 3)
+        if len(partes) >= 3 and partes[1] == 'p' and partes[2]:
+            environ['alquileres.portafolio'] = partes[2]
+            environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + f'/p/{partes[2]}'
+            environ['PATH_INFO'] = '/' + (partes[3] if len(partes) > 3 else '')
+        return self.wsgi_app(environ, start_response)
+
+app.wsgi_app = PortafolioMiddleware(app.wsgi_app)
+
+@app.before_request
+def resolver_portafolio():
+    """El portafolio sale solo de la URL: /p/<portafolio>/... o, sin prefijo, el principal.
+    
+    Las páginas exponen el prefijo como BASE y todos sus fetch lo usan, así una
+    escritura nunca va a un shard distinto del de la pestaña que la hizo.
+    """
+    desde_url = request.environ.get('alquileres.portafolio')
+    if desde_url and not portafolio_existe(desde_url):
+        return jsonify({'success': False, 'error': 'Portafolio no encontrado'}), 404
+    g.portafolio = desde_url or PORTAFOLIO_PRINCIPAL
+
+def validar_portafolio(ctx, param, valor):
+    """Callback de click: los comandos no crean shards por un nombre mal tipeado."""
+    if not portafolio_existe(valor):
+        raise click.BadParameter(f'no existe el portafolio {valor}')
+    return valor
+
+def crear_portafolio(portafolio):
+    if not SLUG_PORTAFOLIO.match(portafolio):
+        raise ValueError('Nombre inválido: minúsculas, números, "-" o "_" (máx. 40)')
+    get_db(portafolio).close()
+
+@app.cli.command('crear-portafolio')
+@click.argument('portafolio')
+def crear_portafolio_command(portafolio):
+    """Crea un portafolio vacío: flask --app app crear-portafolio familia-gomez"""
+    crear_portafolio(portafolio)
+    click.echo(f'Portafolio {portafolio} creado en {ruta_db(portafolio)}')
+
+def version_datos(conn, tablas):
+    """Versión combinada de las tablas indicadas precedida por la época, p.ej. '81723-3-12-5'."""
+    tablas = ('epoca',) + tuple(tablas)
+    filas = conn.execute(
+        f'SELECT tabla, version FROM versiones WHERE tabla IN ({",".join("?" * len(tablas))})',
+        tablas).fetchall()
+    versiones = {f['tabla']: f['version'] for f in filas}
+    return '-'.join(str(versiones.get(t, 0)) for t in tablas)
+
+# === ARCHIVO POR AÑO (particiones adjuntas en solo lectura) ===
+
+def esquemas_rango(conn, desde, hasta):
+    """Particiones a consultar para el rango de fechas [desde, hasta].
+    
+    Siempre incluye 'main' (los años no archivados del rango viven ahí) y
+    adjunta los archivos de los años cerrados del rango. El año en curso nunca
+    toca archivos. ValueError si el rango necesita más archivos de los que
+    SQLite deja adjuntar a una conexión.
+    """
+    try:
+        anio_desde, anio_hasta = int(str(desde)[:4]), int(str(hasta)[:4])
+    except ValueError:
+        return ['main']
+    anio_hasta = min(anio_hasta, datetime.now().year - 1)
+    if anio_desde > anio_hasta:
+        return ['main']
+    
+    archivados = conn.execute('''
+        SELECT anio, archivo FROM anios_archivados
+        WHERE anio BETWEEN ? AND ? ORDER BY anio
+    ''', (anio_desde, anio_hasta)).fetchall()
+    if not archivados:
+        return ['main']
+    
+    adjuntos = {r['name'] for r in conn.execute('PRAGMA database_list')}
+    faltantes = sum(1 for a in archivados if f'archivo_{a["anio"]}' not in adjuntos)
+    libres = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) - len(adjuntos - {'main', 'temp'})
+    if faltantes > libres:
+        raise ValueError(f'El rango abarca {len(archivados)} años archivados; '
+                         f'se pueden consultar hasta {libres} a la vez')
+    esquemas = ['main']
+    for a in archivados:
+        alias = f'archivo_{a["anio"]}'
+        if alias not in adjuntos:
+            conn.execute(f'ATTACH DATABASE ? AS {alias}', (f'file:{a["archivo"]}?mode=ro',))
+        esquemas.append(alias)
+    return esquemas
+
+def esquemas_anio(conn, year):
+    return esquemas_rango(conn, str(year), str(year))
+
+def anio_archivado(conn, fechas):
+    """Primer año archivado entre `fechas` (fechas ISO o años), o None.
+    
+    Un año archivado es de solo lectura: una carga nueva en main no ve las noches
+    del archivo y las duplicaría en los resúmenes.
+    """
+    anios = sorted({int(str(f)[:4]) for f in fechas if str(f)[:4].isdigit()})
+    if not anios:
+        return None
+    return conn.execute(f'SELECT MIN(anio) FROM anios_archivados WHERE anio IN ({",".join("?" * len(anios))})',
+                        anios).fetchone()[0]
+
+def error_anio_archivado(anio):
+    return jsonify({'success': False, 'error': f'El año {anio} está archivado (solo lectura)'}), 409
+
+def fuente(conn, tabla, esquemas):
+    """Fragmento SQL para leer `tabla` desde todas las particiones indicadas."""
+    if esquemas == ['main']:
+        return tabla
+    columnas = [c['name'] for c in conn.execute(f'PRAGMA main.table_info({tabla})')]
+    partes = []
+    for esquema in esquemas:
+        existentes = {c['name'] for c in conn.execute(f'PRAGMA {esquema}.table_info({tabla})')}
+        cols = ', '.join(c if c in existentes else f'NULL AS {c}' for c in columnas)
+        partes.append(f'SELECT {cols} FROM {esquema}.{tabla}')
+    return '(' + ' UNION ALL '.join(partes) + ')'
+
+def archivar_anio(year, portafolio=PORTAFOLIO_PRINCIPAL):
+    """Mueve las filas de un año cerrado a data/archivo/alquileres_<año>.db."""
+    if year >= datetime.now().year:
+        raise ValueError(f'Solo se pueden archivar años cerrados ({year})')
+    
+    directorio = directorio_portafolio(ARCHIVO_DIR, portafolio)
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f'alquileres_{year}.db')
+    conn = get_db(portafolio)
+    conn.execute('ATTACH DATABASE ? AS destino', (ruta,))
+    movidas = {}
+    try:
+        for tabla in TABLAS_ARCHIVABLES:
+            sql = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?",
+                               (tabla,)).fetchone()['sql']
+            conn.execute(sql.replace(f'CREATE TABLE IF NOT EXISTS {tabla}', f'CREATE TABLE {tabla}', 1)
+                            .replace(f'CREATE TABLE {tabla}', f'CREATE TABLE IF NOT EXISTS destino.{tabla}', 1))
+        conn.execute('CREATE INDEX IF NOT EXISTS destino.idx_ocupaciones_fecha ON ocupaciones(fecha)')
+        conn.execute('CREATE INDEX IF NOT EXISTS destino.idx_gastos_fecha ON gastos(fecha)')
+        
+        conn.execute('BEGIN IMMEDIATE')
+        for tabla, condicion in TABLAS_ARCHIVABLES.items():
+            param = (year,) if tabla == 'alquileres_mensuales' else (str(year),)
+            destino = {c['name'] for c in conn.execute(f'PRAGMA destino.table_info({tabla})')}
+            cols = ', '.join(c['name'] for c in conn.execute(f'PRAGMA main.table_info({tabla})')
+                             if c['name'] in destino)
+            conn.execute(f'''INSERT OR REPLACE INTO destino.{tabla} ({cols})
+                             SELECT {cols} FROM main.{tabla} WHERE {condicion}''', param)
+            movidas[tabla] = conn.execute(f'DELETE FROM main.{tabla} WHERE {condicion}', param).rowcount
+        crear_indices_busqueda(conn, 'destino', reconstruir=True)
+        conn.execute('INSERT OR REPLACE INTO anios_archivados (anio, archivo) VALUES (?, ?)', (year, ruta))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute('DETACH DATABASE destino')
+        conn.close()
+    return movidas
+
+@app.cli.command('archivar')
+@click.argument('year', type=int)
+@click.option('--portafolio', default=PORTAFOLIO_PRINCIPAL, show_default=True, callback=validar_portafolio)
+def archivar_command(year, portafolio):
+    """Archiva un año cerrado: flask --app app archivar 2023"""
+    movidas = archivar_anio(year, portafolio)
+    for tabla, cantidad in movidas.items():
+        click.echo(f'{tabla}: {cantidad} filas movidas')
+    click.echo(f'Año {year} archivado en {directorio_portafolio(ARCHIVO_DIR, portafolio)}')
+
+# === ASSETS ESTÁTICOS (hash de contenido, precomprimidos con gzip) ===
+
+_assets = {}          # 'index.js' -> '/assets/index.<hash>.js'
+_assets_por_url = {}  # 'index.<hash>.js' -> (mimetype, contenido, contenido_gzip, hash)
+_paginas = {}         # (template, script_root, contexto) -> (html, html_gzip, hash)
+
+def compilar_assets():
+    """Lee static/css y static/js, calcula el hash y precomprime cada archivo."""
+    _assets.clear()
+    _assets_por_url.clear()
+    for sub, mimetype in (('css', 'text/css'), ('js', 'application/javascript')):
+        carpeta = os.path.join(app.root_path, 'static', sub)
+        if not os.path.isdir(carpeta):
+            continue
+        for nombre in sorted(os.listdir(carpeta)):
+            with open(os.path.join(carpeta, nombre), 'rb') as f:
+                contenido = f.read()
+            digest = hashlib.sha256(contenido).hexdigest()[:12]
+            base, ext = os.path.splitext(nombre)
+            hasheado = f'{base}.{digest}{ext}'
+            _assets[nombre] = f'/assets/{hasheado}'
+            _assets_por_url[hasheado] = (f'{mimetype}; charset=utf-8', contenido,
+                                         gzip.compress(contenido, 9, mtime=0), digest)
+
+compilar_assets()
+
+@app.template_global()
+def asset(nombre):
+    if app.debug:
+        compilar_assets()
+    return _assets[nombre]
+
+def respuesta_precomprimida(contenido, comprimido, digest, mimetype, cache_control):
+    if request.if_none_match.contains(digest):
+        resp = Response(status=304)
+    elif 'gzip' in request.accept_encodings:
+        resp = Response(comprimido, mimetype=mimetype)
+        resp.headers['Content-Encoding'] = 'gzip'
+    else:
+        resp = Response(contenido, mimetype=mimetype)
+    resp.set_etag(digest)
+    resp.headers['Cache-Control'] = cache_control
+    resp.headers['Vary'] = 'Accept-Encoding'
+    return resp
+
+@app.route('/assets/<nombre>')
+def servir_asset(nombre):
+    encontrado = _assets_por_url.get(nombre)
+    if not encontrado:
+        return "No encontrado", 404
+    mimetype, contenido, comprimido, digest = encontrado
+    # La URL cambia con el contenido: el navegador puede guardarlo para siempre
+    return respuesta_precomprimida(contenido, comprimido, digest, mimetype,
+                                   'public, max-age=31536000, immutable')
+
+def pagina(template, **contexto):
+    """Renderiza la página una sola vez por portafolio y la sirve comprimida y con ETag."""
+    # script_root (/p/<portafolio>) queda escrito en la página como BASE de los fetch
+    clave = (template, request.script_root, tuple(sorted(contexto.items())))
+    cacheada = None if app.debug else _paginas.get(clave)
+    if not cacheada:
+        html = render_template(template, **contexto).encode('utf-8')
+        cacheada = (html, gzip.compress(html, 9, mtime=0), hashlib.sha256(html).hexdigest()[:12])
+        _paginas[clave] = cacheada
+    html, comprimido, digest = cacheada
+    return respuesta_precomprimida(html, comprimido, digest, 'text/html', 'no-cache')
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return pagina('index.html')
 
 # === FORMULARIOS EXTERNOS PARA ALICIA Y ESTANISLAO ===
 
@@ -93,14 +619,14 @@ def index():
 def formulario_externo(nombre):
     if nombre.lower() not in ['alicia', 'estanislao']:
         return "Acceso no autorizado", 403
-    return render_template('cargar_externo.html', nombre=nombre.capitalize())
+    return pagina('cargar_externo.html', nombre=nombre.capitalize())
 
 # Vista General para Alicia y Estanislao (pueden ver calendario + cargar)
 @app.route('/vista/<nombre>')
 def vista_externo(nombre):
     if nombre.lower() not in ['alicia', 'estanislao']:
         return "Acceso no autorizado", 403
-    return render_template('vista_externo.html', nombre=nombre.capitalize())
+    return pagina('vista_externo.html', nombre=nombre.capitalize())
 
 @app.route('/api/cargar-externo', methods=['POST'])
 def guardar_carga_externa():
@@ -118,9 +644,13 @@ def guardar_carga_externa():
         
         fecha_inicio = datetime.strptime(data['fecha_inicio'], '%Y-%m-%d')
         fecha_fin = datetime.strptime(data['fecha_fin'], '%Y-%m-%d')
+        anio = anio_archivado(conn, range(fecha_inicio.year, fecha_fin.year + 1))
+        if anio:
+            return error_anio_archivado(anio)
         
         dias_guardados = 0
         fecha_actual = fecha_inicio
+        grupo = nuevo_grupo()
         
         while fecha_actual <= fecha_fin:
             fecha_str = fecha_actual.strftime('%Y-%m-%d')
@@ -138,15 +668,15 @@ def guardar_carga_externa():
             
             # Insertar nueva ocupación
             conn.execute('''
-                INSERT INTO ocupaciones (propiedad_id, fecha, precio, origen, notas)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (prop['id'], fecha_str, data['precio'], data['origen'], data['inquilino']))
+                INSERT INTO ocupaciones (propiedad_id, fecha, precio, origen, notas, grupo)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (prop['id'], fecha_str, data['precio'], data['origen'], data['inquilino'], grupo))
             
             dias_guardados += 1
             fecha_actual += timedelta(days=1)
         
         conn.commit()
-        return jsonify({'success': True, 'dias': dias_guardados})
+        return jsonify({'success': True, 'dias': dias_guardados, 'grupo': grupo if dias_guardados else None})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
     finally:
@@ -156,7 +686,8 @@ def guardar_carga_externa():
 def obtener_cargas_externo(origen):
     conn = get_db()
     cargas = conn.execute('''
-        SELECT o.id, o.fecha, o.precio, o.notas, p.nombre as propiedad
+        SELECT o.id, o.fecha, o.precio, o.notas, o.grupo, p.nombre as propiedad,
+               (SELECT COUNT(*) FROM ocupaciones g WHERE g.grupo = o.grupo) as noches_grupo
         FROM ocupaciones o
         JOIN propiedades p ON o.propiedad_id = p.id
         WHERE o.origen = ?
@@ -198,19 +729,74 @@ def modificar_carga_externa(id):
     conn.close()
     return jsonify({'success': True})
 
-@app.route('/api/propiedades')
+@app.route('/api/propiedades', methods=['GET', 'POST'])
 def get_propiedades():
     conn = get_db()
+    if request.method == 'POST':
+        data = request.json
+        try:
+            conn.execute('INSERT INTO propiedades (nombre, tipo) VALUES (?, ?)',
+                         (data['nombre'], data.get('tipo', 'temporario')))
+            conn.commit()
+            return jsonify({'success': True})
+        except Exception as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        finally:
+            conn.close()
     props = conn.execute('SELECT * FROM propiedades WHERE activo = 1').fetchall()
     conn.close()
     return jsonify([dict(p) for p in props])
 
+# === PORTAFOLIOS: listado y resumen cruzado ===
+
+@app.route('/api/portafolios')
+def get_portafolios():
+    return jsonify({'actual': portafolio_actual(), 'portafolios': listar_portafolios()})
+
+def _totales_portafolio(portafolio, year):
+    conn = get_db(portafolio)
+    try:
+        esquemas = esquemas_anio(conn, year)
+        ingresos = conn.execute(f'''
+            SELECT COALESCE(SUM(precio), 0) as total, COUNT(*) as noches
+            FROM {fuente(conn, 'ocupaciones', esquemas)}
+            WHERE strftime('%Y', fecha) = ?
+        ''', (str(year),)).fetchone()
+        mensuales = conn.execute(f'''
+            SELECT COALESCE(SUM(monto), 0) FROM {fuente(conn, 'alquileres_mensuales', esquemas)}
+            WHERE año = ?
+        ''', (year,)).fetchone()[0]
+        gastos = conn.execute(f'''
+            SELECT COALESCE(SUM(monto), 0) FROM {fuente(conn, 'gastos', esquemas)}
+            WHERE strftime('%Y', fecha) = ?
+        ''', (str(year),)).fetchone()[0]
+        propiedades = conn.execute('SELECT COUNT(*) FROM propiedades WHERE activo = 1').fetchone()[0]
+    finally:
+        conn.close()
+    return {
+        'portafolio': portafolio,
+        'propiedades': propiedades,
+        'noches': ingresos['noches'],
+        'ingresos': ingresos['total'] + mensuales,
+        'gastos': gastos,
+        'rentabilidad': ingresos['total'] + mensuales - gastos,
+    }
+
+@app.route('/api/portafolios/resumen/<int:year>')
+def resumen_portafolios(year):
+    portafolios = listar_portafolios()
+    # Cada shard es un archivo aparte: las consultas corren en paralelo sin bloquearse
+    with ThreadPoolExecutor(max_workers=min(8, len(portafolios))) as pool:
+        totales = list(pool.map(lambda p: _totales_portafolio(p, year), portafolios))
+    return jsonify(totales)
+
 @app.route('/api/ocupaciones/<int:year>/<int:month>')
 def get_ocupaciones(year, month):
     conn = get_db()
-    ocupaciones = conn.execute('''
+    esquemas = esquemas_anio(conn, year)
+    ocupaciones = conn.execute(f'''
         SELECT o.*, p.nombre as propiedad_nombre 
-        FROM ocupaciones o 
+        FROM {fuente(conn, 'ocupaciones', esquemas)} o 
         JOIN propiedades p ON o.propiedad_id = p.id
         WHERE strftime('%Y', o.fecha) = ? AND strftime('%m', o.fecha) = ?
     ''', (str(year), str(month).zfill(2))).fetchall()
@@ -222,10 +808,14 @@ def guardar_ocupacion():
     data = request.json
     conn = get_db()
     try:
+        anio = anio_archivado(conn, [data['fecha']])
+        if anio:
+            return error_anio_archivado(anio)
         conn.execute('''
-            INSERT OR REPLACE INTO ocupaciones (propiedad_id, fecha, precio, origen, notas)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (data['propiedad_id'], data['fecha'], data['precio'], data['origen'], data.get('notas', '')))
+            INSERT OR REPLACE INTO ocupaciones (propiedad_id, fecha, precio, origen, notas, grupo)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (data['propiedad_id'], data['fecha'], data['precio'], data['origen'], data.get('notas', ''),
+              data.get('grupo') or nuevo_grupo()))
         conn.commit()
         return jsonify({'success': True})
     except Exception as e:
@@ -245,19 +835,169 @@ def eliminar_ocupacion(propiedad_id, fecha):
 def editar_ocupacion(ocupacion_id):
     data = request.json
     conn = get_db()
-    conn.execute('''
+    editadas = conn.execute('''
         UPDATE ocupaciones SET precio = ?, origen = ?, notas = ?
         WHERE id = ?
-    ''', (data['precio'], data['origen'], data['notas'], ocupacion_id))
+    ''', (data['precio'], data['origen'], data['notas'], ocupacion_id)).rowcount
     conn.commit()
     conn.close()
+    if not editadas:
+        # Tampoco se editan noches de años archivados: no están en main
+        return jsonify({'success': False, 'error': 'Ocupación no encontrada'}), 404
     return jsonify({'success': True})
 
+# === ESTADÍAS (todas las noches de un grupo en una sola operación) ===
+
+@app.route('/api/ocupaciones/lote', methods=['POST'])
+def guardar_lote_ocupaciones():
+    """Selección múltiple: una estadía (grupo) por propiedad, en una transacción."""
+    data = request.json
+    conn = get_db()
+    try:
+        grupos = {}
+        filas = []
+        for n in data['noches']:
+            grupo = grupos.setdefault(n['propiedad_id'], nuevo_grupo())
+            filas.append((n['propiedad_id'], n['fecha'], data['precio'], data['origen'],
+                          data.get('notas', ''), grupo))
+        anio = anio_archivado(conn, [f[1] for f in filas])
+        if anio:
+            return error_anio_archivado(anio)
+        with conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO ocupaciones (propiedad_id, fecha, precio, origen, notas, grupo)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', filas)
+        return jsonify({'success': True, 'noches': len(filas), 'grupos': list(grupos.values())})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    finally:
+        conn.close()
+
+def _grupo_es_de(conn, grupo, origen):
+    """Un solo chequeo por grupo: todas sus noches tienen que ser de `origen`."""
+    fila = conn.execute('''
+        SELECT COUNT(*) AS noches, COALESCE(SUM(lower(origen) != lower(?)), 0) AS ajenas
+        FROM ocupaciones WHERE grupo = ?
+    ''', (origen, grupo)).fetchone()
+    return fila['noches'] > 0 and fila['ajenas'] == 0
+
+def _editar_grupo(conn, grupo, cambios, desplazar_dias=0, propiedad_id=None):
+    """Aplica precio/notas/origen, corrimiento de fechas y cambio de propiedad al grupo entero."""
+    with conn:
+        noches = 0
+        if cambios:
+            sets = ', '.join(f'{campo} = ?' for campo in cambios)
+            noches = conn.execute(f'UPDATE ocupaciones SET {sets} WHERE grupo = ?',
+                                  list(cambios.values()) + [grupo]).rowcount
+        if desplazar_dias or propiedad_id:
+            # En dos pasos, para que las noches del grupo no choquen entre sí
+            # con UNIQUE(propiedad_id, fecha) mientras se corren
+            conn.execute("UPDATE ocupaciones SET fecha = '~' || fecha WHERE grupo = ?", (grupo,))
+            noches = conn.execute('''
+                UPDATE ocupaciones
+                SET fecha = date(substr(fecha, 2), ?), propiedad_id = COALESCE(?, propiedad_id)
+                WHERE grupo = ?
+            ''', (f'{desplazar_dias:+d} days', propiedad_id, grupo)).rowcount
+    return noches
+
+def _respuesta_edicion_grupo(conn, grupo, cambios, data):
+    try:
+        desplazar = int(data.get('desplazar_dias') or 0)
+        propiedad_id = data.get('propiedad_id')
+        if propiedad_id and not conn.execute('SELECT 1 FROM propiedades WHERE id = ?', (propiedad_id,)).fetchone():
+            return jsonify({'success': False, 'error': 'Propiedad no encontrada'}), 400
+        # Mover o cambiar de propiedad reescribe las fechas con date(): una fecha no ISO quedaría en NULL
+        invalida = conn.execute('SELECT fecha FROM ocupaciones WHERE grupo = ? AND date(fecha) IS NULL LIMIT 1',
+                                (grupo,)).fetchone()
+        if invalida:
+            return jsonify({'success': False,
+                            'error': f"La estadía tiene una fecha inválida: {invalida['fecha']}"}), 400
+        if desplazar:
+            extremos = conn.execute('SELECT MIN(fecha), MAX(fecha) FROM ocupaciones WHERE grupo = ?',
+                                    (grupo,)).fetchone()
+            if extremos[0]:
+                desde, hasta = (date.fromisoformat(f) + timedelta(days=desplazar) for f in extremos)
+                anio = anio_archivado(conn, range(desde.year, hasta.year + 1))
+                if anio:
+                    return error_anio_archivado(anio)
+        noches = _editar_grupo(conn, grupo, cambios, desplazar, propiedad_id)
+        return jsonify({'success': True, 'noches': noches})
+    except sqlite3.IntegrityError:
+        return jsonify({'success': False, 'error': 'Las nuevas fechas se superponen con otra ocupación'}), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@app.route('/api/grupo/<grupo>')
+def obtener_grupo(grupo):
+    conn = get_db()
+    noches = conn.execute('''
+        SELECT o.*, p.nombre as propiedad_nombre
+        FROM ocupaciones o
+        JOIN propiedades p ON o.propiedad_id = p.id
+        WHERE o.grupo = ?
+        ORDER BY o.fecha
+    ''', (grupo,)).fetchall()
+    conn.close()
+    if not noches:
+        return jsonify({'success': False, 'error': 'Estadía no encontrada'}), 404
+    return jsonify([dict(n) for n in noches])
+
+@app.route('/api/grupo/<grupo>', methods=['PUT'])
+def editar_grupo(grupo):
+    data = request.json
+    conn = get_db()
+    try:
+        cambios = {k: data[k] for k in ('precio', 'origen', 'notas') if k in data}
+        return _respuesta_edicion_grupo(conn, grupo, cambios, data)
+    finally:
+        conn.close()
+
+@app.route('/api/grupo/<grupo>', methods=['DELETE'])
+def eliminar_grupo(grupo):
+    conn = get_db()
+    with conn:
+        noches = conn.execute('DELETE FROM ocupaciones WHERE grupo = ?', (grupo,)).rowcount
+    conn.close()
+    return jsonify({'success': True, 'noches': noches})
+
+@app.route('/api/modificar-carga-grupo/<grupo>', methods=['PUT'])
+def modificar_carga_externa_grupo(grupo):
+    data = request.json
+    conn = get_db()
+    try:
+        if not _grupo_es_de(conn, grupo, data['origen']):
+            return jsonify({'success': False, 'error': 'No autorizado'}), 403
+        cambios = {}
+        if 'precio' in data:
+            cambios['precio'] = data['precio']
+        if 'inquilino' in data:
+            cambios['notas'] = data['inquilino']
+        return _respuesta_edicion_grupo(conn, grupo, cambios, data)
+    finally:
+        conn.close()
+
+@app.route('/api/borrar-carga-grupo/<grupo>/<origen>', methods=['DELETE'])
+def borrar_carga_externa_grupo(grupo, origen):
+    conn = get_db()
+    try:
+        if not _grupo_es_de(conn, grupo, origen):
+            return jsonify({'success': False, 'error': 'No autorizado'}), 403
+        with conn:
+            noches = conn.execute('DELETE FROM ocupaciones WHERE grupo = ?', (grupo,)).rowcount
+        return jsonify({'success': True, 'noches': noches})
+    finally:
+        conn.close()
+
 @app.route('/api/gastos', methods=['GET', 'POST'])
 def gastos():
     conn = get_db()
     if request.method == 'POST':
         data = request.json
+        anio = anio_archivado(conn, [data['fecha']])
+        if anio:
+            conn.close()
+            return error_anio_archivado(anio)
         conn.execute('''
             INSERT INTO gastos (propiedad_id, fecha, monto, categoria, descripcion)
             VALUES (?, ?, ?, ?, ?)
@@ -267,9 +1007,10 @@ def gastos():
         return jsonify({'success': True})
     else:
         year = request.args.get('year', datetime.now().year)
-        gastos = conn.execute('''
+        esquemas = esquemas_anio(conn, year)
+        gastos = conn.execute(f'''
             SELECT g.*, p.nombre as propiedad_nombre 
-            FROM gastos g 
+            FROM {fuente(conn, 'gastos', esquemas)} g 
             LEFT JOIN propiedades p ON g.propiedad_id = p.id
             WHERE strftime('%Y', g.fecha) = ?
             ORDER BY g.fecha DESC
@@ -290,9 +1031,10 @@ def eliminar_gasto(id):
 @app.route('/api/alquileres-mensuales/<int:year>')
 def get_alquileres_mensuales(year):
     conn = get_db()
-    alquileres = conn.execute('''
+    esquemas = esquemas_anio(conn, year)
+    alquileres = conn.execute(f'''
         SELECT a.*, p.nombre as propiedad_nombre 
-        FROM alquileres_mensuales a 
+        FROM {fuente(conn, 'alquileres_mensuales', esquemas)} a 
         JOIN propiedades p ON a.propiedad_id = p.id
         WHERE a.año = ?
         ORDER BY a.mes
@@ -305,6 +1047,9 @@ def guardar_alquiler_mensual():
     data = request.json
     conn = get_db()
     try:
+        anio = anio_archivado(conn, [data['año']])
+        if anio:
+            return error_anio_archivado(anio)
         conn.execute('''
             INSERT OR REPLACE INTO alquileres_mensuales (propiedad_id, año, mes, monto, notas)
             VALUES (?, ?, ?, ?, ?)
@@ -328,41 +1073,42 @@ def eliminar_alquiler_mensual(propiedad_id, anio, mes):
 @app.route('/api/resumen/<int:year>')
 def resumen(year):
     conn = get_db()
+    esquemas = esquemas_anio(conn, year)
     
     # Ingresos de ocupaciones temporarias
-    ingresos = conn.execute('''
+    ingresos = conn.execute(f'''
         SELECT p.id, p.nombre, p.tipo, o.origen,
                COUNT(*) as noches,
                SUM(o.precio) as total_ingresos
-        FROM ocupaciones o
+        FROM {fuente(conn, 'ocupaciones', esquemas)} o
         JOIN propiedades p ON o.propiedad_id = p.id
         WHERE strftime('%Y', o.fecha) = ?
         GROUP BY p.id, o.origen
     ''', (str(year),)).fetchall()
     
     # Ingresos de alquileres mensuales
-    ingresos_mensuales = conn.execute('''
+    ingresos_mensuales = conn.execute(f'''
         SELECT p.id, p.nombre, p.tipo,
                COUNT(*) as meses,
                SUM(a.monto) as total_ingresos
-        FROM alquileres_mensuales a
+        FROM {fuente(conn, 'alquileres_mensuales', esquemas)} a
         JOIN propiedades p ON a.propiedad_id = p.id
         WHERE a.año = ?
         GROUP BY p.id
     ''', (year,)).fetchall()
     
-    gastos = conn.execute('''
+    gastos = conn.execute(f'''
         SELECT p.id, p.nombre, g.categoria,
                SUM(g.monto) as total_gastos
-        FROM gastos g
+        FROM {fuente(conn, 'gastos', esquemas)} g
         LEFT JOIN propiedades p ON g.propiedad_id = p.id
         WHERE strftime('%Y', g.fecha) = ?
         GROUP BY p.id, g.categoria
     ''', (str(year),)).fetchall()
     
-    gastos_generales = conn.execute('''
+    gastos_generales = conn.execute(f'''
         SELECT SUM(monto) as total
-        FROM gastos
+        FROM {fuente(conn, 'gastos', esquemas)}
         WHERE propiedad_id IS NULL AND strftime('%Y', fecha) = ?
     ''', (str(year),)).fetchone()
     
@@ -378,10 +1124,11 @@ def resumen(year):
 @app.route('/api/ingresos-detalle/<int:year>')
 def ingresos_detalle(year):
     conn = get_db()
-    ingresos = conn.execute('''
+    esquemas = esquemas_anio(conn, year)
+    ingresos = conn.execute(f'''
         SELECT o.fecha, p.nombre as propiedad, o.precio, o.origen, o.notas,
                strftime('%m', o.fecha) as mes
-        FROM ocupaciones o
+        FROM {fuente(conn, 'ocupaciones', esquemas)} o
         JOIN propiedades p ON o.propiedad_id = p.id
         WHERE strftime('%Y', o.fecha) = ?
         ORDER BY o.fecha DESC
@@ -392,11 +1139,12 @@ def ingresos_detalle(year):
 @app.route('/api/gastos-detalle/<int:year>')
 def gastos_detalle(year):
     conn = get_db()
-    gastos = conn.execute('''
+    esquemas = esquemas_anio(conn, year)
+    gastos = conn.execute(f'''
         SELECT g.fecha, COALESCE(p.nombre, 'General') as propiedad, 
                g.categoria, g.monto, g.descripcion,
                strftime('%m', g.fecha) as mes
-        FROM gastos g
+        FROM {fuente(conn, 'gastos', esquemas)} g
         LEFT JOIN propiedades p ON g.propiedad_id = p.id
         WHERE strftime('%Y', g.fecha) = ?
         ORDER BY g.fecha DESC
@@ -404,160 +1152,175 @@ def gastos_detalle(year):
     conn.close()
     return jsonify([dict(g) for g in gastos])
 
+def generar_excel(conn, desde, hasta, propiedad=''):
+    """Arma el Workbook de ingresos, gastos y resumen para el período y propiedad."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    
+    esquemas = esquemas_rango(conn, desde, hasta)
+    ocupaciones_src = fuente(conn, 'ocupaciones', esquemas)
+    gastos_src = fuente(conn, 'gastos', esquemas)
+    wb = Workbook()
+    
+    # Estilos
+    header_font = Font(bold=True, color='FFFFFF')
+    header_fill = PatternFill(start_color='1E3A5F', end_color='1E3A5F', fill_type='solid')
+    border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    
+    # Hoja de Ingresos
+    ws1 = wb.active
+    ws1.title = "Ingresos"
+    headers = ['Fecha', 'Propiedad', 'Precio USD', 'Origen', 'Inquilino']
+    ws1.append(headers)
+    for cell in ws1[1]:
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.border = border
+    
+    query = f'''
+        SELECT o.fecha, p.nombre, o.precio, o.origen, o.notas
+        FROM {ocupaciones_src} o
+        JOIN propiedades p ON o.propiedad_id = p.id
+        WHERE o.fecha >= ? AND o.fecha <= ?
+    '''
+    params = [desde, hasta]
+    
+    if propiedad:
+        query += ' AND p.nombre = ?'
+        params.append(propiedad)
+    
+    query += ' ORDER BY o.fecha, p.nombre'
+    ocupaciones = conn.execute(query, params).fetchall()
+    
+    total_ingresos = 0
+    for o in ocupaciones:
+        ws1.append(list(o))
+        total_ingresos += o[2] if o[2] else 0
+    
+    # Fila de total
+    ws1.append(['', '', '', '', ''])
+    ws1.append(['TOTAL', '', total_ingresos, '', ''])
+    
+    # Ajustar anchos
+    ws1.column_dimensions['A'].width = 12
+    ws1.column_dimensions['B'].width = 15
+    ws1.column_dimensions['C'].width = 12
+    ws1.column_dimensions['D'].width = 12
+    ws1.column_dimensions['E'].width = 25
+    
+    # Hoja de Gastos
+    ws2 = wb.create_sheet("Gastos")
+    headers = ['Fecha', 'Propiedad', 'Categoría', 'Monto USD', 'Descripción']
+    ws2.append(headers)
+    for cell in ws2[1]:
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.border = border
+    
+    query_gastos = f'''
+        SELECT g.fecha, COALESCE(p.nombre, 'General'), g.categoria, g.monto, g.descripcion
+        FROM {gastos_src} g
+        LEFT JOIN propiedades p ON g.propiedad_id = p.id
+        WHERE g.fecha >= ? AND g.fecha <= ?
+    '''
+    params_gastos = [desde, hasta]
+    
+    if propiedad:
+        query_gastos += ' AND (p.nombre = ? OR g.propiedad_id IS NULL)'
+        params_gastos.append(propiedad)
+    
+    query_gastos += ' ORDER BY g.fecha'
+    gastos = conn.execute(query_gastos, params_gastos).fetchall()
+    
+    total_gastos = 0
+    for g in gastos:
+        ws2.append(list(g))
+        total_gastos += g[3] if g[3] else 0
+    
+    ws2.append(['', '', '', '', ''])
+    ws2.append(['TOTAL', '', '', total_gastos, ''])
+    
+    ws2.column_dimensions['A'].width = 12
+    ws2.column_dimensions['B'].width = 15
+    ws2.column_dimensions['C'].width = 15
+    ws2.column_dimensions['D'].width = 12
+    ws2.column_dimensions['E'].width = 30
+    
+    # Hoja de Resumen
+    ws3 = wb.create_sheet("Resumen")
+    ws3.append([f'Período: {desde} al {hasta}'])
+    ws3.append([f'Propiedad: {propiedad if propiedad else "Todas"}'])
+    ws3.append([''])
+    
+    headers = ['Propiedad', 'Ingresos', 'Noches', 'Ticket Prom', 'Gastos', 'Rentabilidad']
+    ws3.append(headers)
+    for cell in ws3[4]:
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.border = border
+    
+    query_resumen = f'''
+        SELECT p.nombre,
+               COALESCE(SUM(o.precio), 0) as ingresos,
+               COUNT(o.id) as noches
+        FROM propiedades p
+        LEFT JOIN {ocupaciones_src} o ON p.id = o.propiedad_id 
+            AND o.fecha >= ? AND o.fecha <= ?
+    '''
+    params_res = [desde, hasta]
+    
+    if propiedad:
+        query_resumen += ' WHERE p.nombre = ?'
+        params_res.append(propiedad)
+    
+    query_resumen += ' GROUP BY p.id'
+    resumen = conn.execute(query_resumen, params_res).fetchall()
+    
+    for r in resumen:
+        nombre, ingresos, noches = r
+        ticket = ingresos / noches if noches > 0 else 0
+        gasto_query = f'''
+            SELECT COALESCE(SUM(monto), 0) FROM {gastos_src} 
+            WHERE propiedad_id = (SELECT id FROM propiedades WHERE nombre = ?) 
+            AND fecha >= ? AND fecha <= ?
+        '''
+        gasto = conn.execute(gasto_query, (nombre, desde, hasta)).fetchone()[0]
+        rentabilidad = ingresos - gasto
+        ws3.append([nombre, ingresos, noches, round(ticket, 2), gasto, rentabilidad])
+    
+    for col in ['A', 'B', 'C', 'D', 'E', 'F']:
+        ws3.column_dimensions[col].width = 14
+    
+    return wb
+
 @app.route('/api/exportar/excel')
 def exportar_excel():
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-        
         # Obtener parámetros de filtro
         desde = request.args.get('desde', f'{datetime.now().year}-01-01')
         hasta = request.args.get('hasta', f'{datetime.now().year}-12-31')
         propiedad = request.args.get('propiedad', '')
         
         conn = get_db()
-        wb = Workbook()
-        
-        # Estilos
-        header_font = Font(bold=True, color='FFFFFF')
-        header_fill = PatternFill(start_color='1E3A5F', end_color='1E3A5F', fill_type='solid')
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Hoja de Ingresos
-        ws1 = wb.active
-        ws1.title = "Ingresos"
-        headers = ['Fecha', 'Propiedad', 'Precio USD', 'Origen', 'Inquilino']
-        ws1.append(headers)
-        for cell in ws1[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = border
-        
-        query = '''
-            SELECT o.fecha, p.nombre, o.precio, o.origen, o.notas
-            FROM ocupaciones o
-            JOIN propiedades p ON o.propiedad_id = p.id
-            WHERE o.fecha >= ? AND o.fecha <= ?
-        '''
-        params = [desde, hasta]
+        try:
+            wb = generar_excel(conn, desde, hasta, propiedad)
+        except ValueError as e:
+            # Rango con demasiados años archivados
+            return jsonify({'error': str(e)}), 400
+        finally:
+            conn.close()
         
-        if propiedad:
-            query += ' AND p.nombre = ?'
-            params.append(propiedad)
+        # En memoria: dos exportaciones simultáneas no pisan el mismo archivo en data/
+        salida = io.BytesIO()
+        wb.save(salida)
+        salida.seek(0)
         
-        query += ' ORDER BY o.fecha, p.nombre'
-        ocupaciones = conn.execute(query, params).fetchall()
-        
-        total_ingresos = 0
-        for o in ocupaciones:
-            ws1.append(list(o))
-            total_ingresos += o[2] if o[2] else 0
-        
-        # Fila de total
-        ws1.append(['', '', '', '', ''])
-        ws1.append(['TOTAL', '', total_ingresos, '', ''])
-        
-        # Ajustar anchos
-        ws1.column_dimensions['A'].width = 12
-        ws1.column_dimensions['B'].width = 15
-        ws1.column_dimensions['C'].width = 12
-        ws1.column_dimensions['D'].width = 12
-        ws1.column_dimensions['E'].width = 25
-        
-        # Hoja de Gastos
-        ws2 = wb.create_sheet("Gastos")
-        headers = ['Fecha', 'Propiedad', 'Categoría', 'Monto USD', 'Descripción']
-        ws2.append(headers)
-        for cell in ws2[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = border
-        
-        query_gastos = '''
-            SELECT g.fecha, COALESCE(p.nombre, 'General'), g.categoria, g.monto, g.descripcion
-            FROM gastos g
-            LEFT JOIN propiedades p ON g.propiedad_id = p.id
-            WHERE g.fecha >= ? AND g.fecha <= ?
-        '''
-        params_gastos = [desde, hasta]
-        
-        if propiedad:
-            query_gastos += ' AND (p.nombre = ? OR g.propiedad_id IS NULL)'
-            params_gastos.append(propiedad)
-        
-        query_gastos += ' ORDER BY g.fecha'
-        gastos = conn.execute(query_gastos, params_gastos).fetchall()
-        
-        total_gastos = 0
-        for g in gastos:
-            ws2.append(list(g))
-            total_gastos += g[3] if g[3] else 0
-        
-        ws2.append(['', '', '', '', ''])
-        ws2.append(['TOTAL', '', '', total_gastos, ''])
-        
-        ws2.column_dimensions['A'].width = 12
-        ws2.column_dimensions['B'].width = 15
-        ws2.column_dimensions['C'].width = 15
-        ws2.column_dimensions['D'].width = 12
-        ws2.column_dimensions['E'].width = 30
-        
-        # Hoja de Resumen
-        ws3 = wb.create_sheet("Resumen")
-        ws3.append([f'Período: {desde} al {hasta}'])
-        ws3.append([f'Propiedad: {propiedad if propiedad else "Todas"}'])
-        ws3.append([''])
-        
-        headers = ['Propiedad', 'Ingresos', 'Noches', 'Ticket Prom', 'Gastos', 'Rentabilidad']
-        ws3.append(headers)
-        for cell in ws3[4]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = border
-        
-        query_resumen = '''
-            SELECT p.nombre,
-                   COALESCE(SUM(o.precio), 0) as ingresos,
-                   COUNT(o.id) as noches
-            FROM propiedades p
-            LEFT JOIN ocupaciones o ON p.id = o.propiedad_id 
-                AND o.fecha >= ? AND o.fecha <= ?
-        '''
-        params_res = [desde, hasta]
-        
-        if propiedad:
-            query_resumen += ' WHERE p.nombre = ?'
-            params_res.append(propiedad)
-        
-        query_resumen += ' GROUP BY p.id'
-        resumen = conn.execute(query_resumen, params_res).fetchall()
-        
-        for r in resumen:
-            nombre, ingresos, noches = r
-            ticket = ingresos / noches if noches > 0 else 0
-            gasto_query = '''
-                SELECT COALESCE(SUM(monto), 0) FROM gastos 
-                WHERE propiedad_id = (SELECT id FROM propiedades WHERE nombre = ?) 
-                AND fecha >= ? AND fecha <= ?
-            '''
-            gasto = conn.execute(gasto_query, (nombre, desde, hasta)).fetchone()[0]
-            rentabilidad = ingresos - gasto
-            ws3.append([nombre, ingresos, noches, round(ticket, 2), gasto, rentabilidad])
-        
-        for col in ['A', 'B', 'C', 'D', 'E', 'F']:
-            ws3.column_dimensions[col].width = 14
-        
-        conn.close()
-        
-        filename = f'data/Reporte_Miami_{desde}_a_{hasta}.xlsx'
-        wb.save(filename)
-        
-        return send_file(filename, as_attachment=True)
+        return send_file(salida, as_attachment=True, download_name=f'Reporte_Miami_{desde}_a_{hasta}.xlsx')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -591,6 +1354,7 @@ def importar_excel():
         prop_map = {p['nombre']: p['id'] for p in props}
         
         # Leer filas (empezando desde la 5, saltando headers)
+        filas = []
         for row_num, row in enumerate(ws.iter_rows(min_row=5, values_only=True), start=5):
             propiedad, fecha, precio, inquilino = row[0], row[1], row[2], row[3]
             
@@ -609,12 +1373,30 @@ def importar_excel():
             else:
                 fecha_str = str(fecha)
             
+            if anio_archivado(conn, [fecha_str]):
+                errores.append(f'Fila {row_num}: el año {fecha_str[:4]} está archivado')
+                continue
+            
+            filas.append((row_num, prop_map[propiedad], fecha_str, precio, inquilino or ''))
+        
+        # Noches consecutivas del mismo inquilino en una propiedad forman una estadía
+        anterior, grupo = None, None
+        for row_num, prop_id, fecha_str, precio, inquilino in sorted(filas, key=lambda f: (f[1], f[2])):
+            try:
+                fecha = date.fromisoformat(fecha_str[:10])
+            except ValueError:
+                fecha = None
+            if not (anterior and fecha and anterior[2] and anterior[:2] == (prop_id, inquilino)
+                    and (fecha - anterior[2]).days == 1):
+                grupo = nuevo_grupo()
+            anterior = (prop_id, inquilino, fecha)
+            
             # Insertar o actualizar
             try:
                 conn.execute('''
-                    INSERT OR REPLACE INTO ocupaciones (propiedad_id, fecha, precio, origen, notas)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (prop_map[propiedad], fecha_str, float(precio or 0), origen, inquilino or ''))
+                    INSERT OR REPLACE INTO ocupaciones (propiedad_id, fecha, precio, origen, notas, grupo)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (prop_id, fecha_str, float(precio or 0), origen, inquilino, grupo))
                 importados += 1
             except Exception as e:
                 errores.append(f'Fila {row_num}: {str(e)}')
@@ -630,264 +1412,786 @@ def importar_excel():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/presentacion/<int:year>')
-def generar_presentacion(year):
+# === CALENDARIOS ICS (por propiedad) ===
+
+_cache_ical = {}  # (portafolio, propiedad_id) -> (version, ics)
+
+def _ical_texto(valor):
+    return (str(valor).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+def _ical_plegar(linea):
+    """Corta las líneas a 75 octetos como pide RFC 5545."""
+    partes, limite = [], 75
+    while len(linea.encode('utf-8')) > limite:
+        corte = limite
+        while len(linea[:corte].encode('utf-8')) > limite:
+            corte -= 1
+        partes.append(linea[:corte])
+        linea = linea[corte:]
+        limite = 74  # las continuaciones llevan un espacio adelante
+    partes.append(linea)
+    return '\r\n '.join(partes)
+
+def estadias(noches):
+    """Agrupa noches consecutivas del mismo inquilino/origen en estadías."""
+    grupos = []
+    for n in noches:
+        try:
+            # La importación de Excel guarda celdas de texto tal cual: puede haber fechas inválidas
+            fecha = date.fromisoformat(str(n['fecha'])[:10])
+        except ValueError:
+            app.logger.warning(f'Ocupación {n["id"]} con fecha inválida: {n["fecha"]!r}')
+            continue
+        ultimo = grupos[-1] if grupos else None
+        if (ultimo and (fecha - ultimo['hasta']).days == 1
+                and ultimo['notas'] == n['notas'] and ultimo['origen'] == n['origen']):
+            ultimo['hasta'] = fecha
+            ultimo['noches'] += 1
+            ultimo['total'] += n['precio'] or 0
+            ultimo['ids'].append(n['id'])
+        else:
+            grupos.append({'desde': fecha, 'hasta': fecha, 'noches': 1, 'total': n['precio'] or 0,
+                           'notas': n['notas'], 'origen': n['origen'], 'ids': [n['id']]})
+    return grupos
+
+def generar_ical(conn, prop):
+    noches = conn.execute('''
+        SELECT id, fecha, precio, origen, notas FROM ocupaciones
+        WHERE propiedad_id = ? ORDER BY fecha
+    ''', (prop['id'],)).fetchall()
+    
+    ahora = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    lineas = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Alquileres Miami//ES',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_ical_texto(prop["nombre"])}',
+    ]
+    for e in estadias(noches):
+        checkout = e['hasta'] + timedelta(days=1)
+        lineas += [
+            'BEGIN:VEVENT',
+            f'UID:{prop["id"]}-{e["desde"].strftime("%Y%m%d")}@alquileres-miami',
+            f'DTSTAMP:{ahora}',
+            f'DTSTART;VALUE=DATE:{e["desde"].strftime("%Y%m%d")}',
+            f'DTEND;VALUE=DATE:{checkout.strftime("%Y%m%d")}',
+            f'SUMMARY:{_ical_texto(e["notas"] or "Ocupado")}',
+            f'DESCRIPTION:{_ical_texto("Origen: " + (e["origen"] or ""))}',
+            'END:VEVENT',
+        ]
+    lineas.append('END:VCALENDAR')
+    return '\r\n'.join(_ical_plegar(l) for l in lineas) + '\r\n'
+
+@app.route('/api/ical/<propiedad>.ics')
+def feed_ical(propiedad):
     conn = get_db()
+    try:
+        prop = conn.execute('SELECT id, nombre FROM propiedades WHERE nombre = ?', (propiedad,)).fetchone()
+        if not prop:
+            return jsonify({'success': False, 'error': 'Propiedad no encontrada'}), 404
+        
+        fila = conn.execute('SELECT version FROM versiones_propiedad WHERE propiedad_id = ?',
+                            (prop['id'],)).fetchone()
+        version = f'{fila["version"] if fila else 0}-{version_datos(conn, ("propiedades",))}'
+        clave = (portafolio_actual(), prop['id'])
+        etag = f'ical-{clave[0]}-{prop["id"]}-{version}'
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            cacheado = _cache_ical.get(clave)
+            if not cacheado or cacheado[0] != version:
+                cacheado = (version, generar_ical(conn, prop))
+                _cache_ical[clave] = cacheado
+            resp = Response(cacheado[1], mimetype='text/calendar')
+    finally:
+        conn.close()
     
-    # Obtener datos
-    props = conn.execute('SELECT * FROM propiedades WHERE activo = 1').fetchall()
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+def _leer_eventos_ical(texto):
+    """Devuelve [(desde, hasta_exclusivo, summary)] de los VEVENT del archivo."""
+    # Desplegar líneas continuadas
+    lineas = []
+    for linea in texto.replace('\r\n', '\n').split('\n'):
+        if linea[:1] in (' ', '\t') and lineas:
+            lineas[-1] += linea[1:]
+        else:
+            lineas.append(linea)
     
-    # Ingresos por propiedad
-    ingresos_data = {}
-    for p in props:
-        data = conn.execute('''
-            SELECT COALESCE(SUM(precio), 0) as total,
-                   COUNT(*) as noches,
-                   origen
-            FROM ocupaciones
-            WHERE propiedad_id = ? AND strftime('%Y', fecha) = ?
-            GROUP BY origen
-        ''', (p['id'], str(year))).fetchall()
+    eventos, actual = [], None
+    for linea in lineas:
+        if linea == 'BEGIN:VEVENT':
+            actual = {}
+        elif linea == 'END:VEVENT' and actual is not None:
+            if 'DTSTART' in actual and actual.get('STATUS', '').upper() != 'CANCELLED':
+                desde = datetime.strptime(actual['DTSTART'][:8], '%Y%m%d').date()
+                hasta = (datetime.strptime(actual['DTEND'][:8], '%Y%m%d').date()
+                         if 'DTEND' in actual else desde + timedelta(days=1))
+                summary = (actual.get('SUMMARY', '').replace('\\n', ' ').replace('\\,', ',')
+                           .replace('\\;', ';').replace('\\\\', '\\'))
+                eventos.append((desde, max(hasta, desde + timedelta(days=1)), summary))
+            actual = None
+        elif actual is not None and ':' in linea:
+            nombre, valor = linea.split(':', 1)
+            actual[nombre.split(';', 1)[0].upper()] = valor.strip()
+    return eventos
+
+@app.route('/api/importar-ical', methods=['POST'])
+def importar_ical():
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'error': 'No se envió archivo'}), 400
+    
+    conn = get_db()
+    try:
+        prop = conn.execute('SELECT id FROM propiedades WHERE nombre = ?',
+                            (request.form.get('propiedad', ''),)).fetchone()
+        if not prop:
+            return jsonify({'success': False, 'error': 'Propiedad no encontrada'}), 400
         
-        ingresos_data[p['nombre']] = {
-            'total': sum(d['total'] for d in data),
-            'noches': sum(d['noches'] for d in data),
-            'por_origen': {d['origen']: d['total'] for d in data}
-        }
-    
-    # Gastos por propiedad
-    gastos_data = {}
-    for p in props:
-        total = conn.execute('''
-            SELECT COALESCE(SUM(monto), 0) as total
-            FROM gastos
-            WHERE propiedad_id = ? AND strftime('%Y', fecha) = ?
-        ''', (p['id'], str(year))).fetchone()['total']
-        gastos_data[p['nombre']] = total
-    
-    # Gastos generales
-    gastos_generales = conn.execute('''
-        SELECT COALESCE(SUM(monto), 0) as total
-        FROM gastos
-        WHERE propiedad_id IS NULL AND strftime('%Y', fecha) = ?
-    ''', (str(year),)).fetchone()['total']
+        origen = request.form.get('origen', 'Dueño')
+        precio = float(request.form.get('precio') or 0)
+        eventos = _leer_eventos_ical(request.files['file'].read().decode('utf-8', errors='replace'))
+        
+        archivados = {r['anio'] for r in conn.execute('SELECT anio FROM anios_archivados')}
+        noches, en_archivo = [], 0
+        for desde, hasta, summary in eventos:
+            grupo = nuevo_grupo()
+            for i in range((hasta - desde).days):
+                fecha = desde + timedelta(days=i)
+                if fecha.year in archivados:
+                    en_archivo += 1
+                    continue
+                noches.append((prop['id'], fecha.isoformat(), precio, origen, summary, grupo))
+        
+        # Una sola transacción; las noches ya ocupadas no se sobrescriben
+        with conn:
+            cursor = conn.executemany('''
+                INSERT OR IGNORE INTO ocupaciones (propiedad_id, fecha, precio, origen, notas, grupo)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', noches)
+        return jsonify({
+            'success': True,
+            'eventos': len(eventos),
+            'importados': cursor.rowcount,
+            'existentes': len(noches) - cursor.rowcount,
+            'archivadas': en_archivo
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    finally:
+        conn.close()
+
+# === BÚSQUEDA (FTS5 sobre inquilinos, notas y gastos) ===
+
+def _consulta_fts(texto):
+    """Cada palabra como prefijo entre comillas: 'juan per' -> '"juan"* "per"*'."""
+    return ' '.join('"{}"*'.format(t.replace('"', '""')) for t in texto.split())
+
+def _buscar_en(conn, esquema, consulta, limite):
+    noches = conn.execute(f'''
+        SELECT '{esquema}' AS esquema, o.id, o.propiedad_id, p.nombre AS propiedad, o.fecha, o.precio,
+               o.origen, o.notas, bm25(ocupaciones_fts) AS rank
+        FROM {esquema}.ocupaciones_fts
+        JOIN {esquema}.ocupaciones o ON o.id = ocupaciones_fts.rowid
+        JOIN propiedades p ON p.id = o.propiedad_id
+        WHERE ocupaciones_fts MATCH ?
+        ORDER BY rank
+        LIMIT 5000
+    ''', (consulta,)).fetchall()
+    gastos = conn.execute(f'''
+        SELECT g.id, g.fecha, COALESCE(p.nombre, 'General') AS propiedad, g.categoria, g.monto,
+               g.descripcion, bm25(gastos_fts) AS rank
+        FROM {esquema}.gastos_fts
+        JOIN {esquema}.gastos g ON g.id = gastos_fts.rowid
+        LEFT JOIN propiedades p ON p.id = g.propiedad_id
+        WHERE gastos_fts MATCH ?
+        ORDER BY rank
+        LIMIT ?
+    ''', (consulta, limite)).fetchall()
+    return noches, gastos
+
+def _indexar_archivo(archivo):
+    """Los archivos creados antes de la búsqueda no tienen FTS: se les agrega una vez."""
+    a = sqlite3.connect(archivo)
+    try:
+        with a:
+            crear_indices_busqueda(a)
+    finally:
+        a.close()
+
+@app.route('/api/buscar')
+def buscar():
+    texto = request.args.get('q', '').strip()
+    limite = request.args.get('limite', 50, type=int)
+    if not texto:
+        return jsonify({'estadias': [], 'gastos': []})
+    consulta = _consulta_fts(texto)
     
-    conn.close()
+    conn = get_db()
+    sin_indice = []
+    try:
+        noches, gastos = _buscar_en(conn, 'main', consulta, limite)
+        noches, gastos = list(noches), list(gastos)
+        # Años archivados: de a uno, para no pasar el límite de bases adjuntas
+        for a in conn.execute('SELECT anio, archivo FROM anios_archivados ORDER BY anio DESC').fetchall():
+            alias = esquemas_anio(conn, a['anio'])[-1]
+            if alias == 'main':
+                continue
+            tablas = {r[0] for r in conn.execute(f"SELECT name FROM {alias}.sqlite_master WHERE type = 'table'")}
+            if 'ocupaciones_fts' not in tablas:
+                conn.execute(f'DETACH DATABASE {alias}')
+                try:
+                    _indexar_archivo(a['archivo'])
+                except sqlite3.Error as e:
+                    app.logger.warning(f'No se pudo indexar el archivo de {a["anio"]}: {e}')
+                    sin_indice.append(a['anio'])
+                    continue
+                alias = esquemas_anio(conn, a['anio'])[-1]
+            n, g = _buscar_en(conn, alias, consulta, limite)
+            noches += n
+            gastos += g
+            conn.execute(f'DETACH DATABASE {alias}')
+    except sqlite3.OperationalError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    finally:
+        conn.close()
+    
+    # Agrupar noches consecutivas en estadías, por propiedad. Los ids se repiten entre
+    # main y los archivos, así que se identifican por (esquema, id)
+    noches = [dict(n, id=(n['esquema'], n['id'])) for n in noches]
+    rank = {n['id']: n['rank'] for n in noches}
+    por_propiedad = {}
+    for n in sorted(noches, key=lambda n: (n['propiedad_id'], n['fecha'])):
+        por_propiedad.setdefault(n['propiedad'], []).append(n)
+    resultados = []
+    for propiedad, filas in por_propiedad.items():
+        for e in estadias(filas):
+            resultados.append({
+                'propiedad': propiedad,
+                'desde': e['desde'].isoformat(),
+                'hasta': e['hasta'].isoformat(),
+                'noches': e['noches'],
+                'total': e['total'],
+                'inquilino': e['notas'],
+                'origen': e['origen'],
+                'rank': min(rank[i] for i in e['ids']),
+            })
+    resultados.sort(key=lambda r: r['desde'], reverse=True)
+    resultados.sort(key=lambda r: r['rank'])
+    
+    return jsonify({
+        'estadias': resultados[:limite],
+        'gastos': [dict(g) for g in sorted(gastos, key=lambda g: g['rank'])[:limite]],
+        'anios_sin_busqueda': sin_indice
+    })
+
+# === PRESENTACIÓN ANUAL (cacheada por año y versión de datos) ===
+
+COLORES_PROPIEDADES = {
+    'TIDES 14 B': '#3498db', 'TIDES 5 L': '#e74c3c', 'TIDES 10 L': '#2ecc71',
+    'TIDES 10 F': '#9b59b6', 'TIDES 12 F': '#f39c12',
+    'Brickell': '#1abc9c', 'Local 1': '#e67e22', 'Local 2': '#34495e'
+}
+
+_cache_presentaciones = {}  # (portafolio, year) -> (version, html)
+
+@app.template_filter('miles')
+def formato_miles(valor):
+    return f'{valor:,.0f}'
+
+def datos_presentacion(conn, year, propiedad=None):
+    if propiedad:
+        props = conn.execute('SELECT * FROM propiedades WHERE nombre = ?', (propiedad,)).fetchall()
+    else:
+        props = conn.execute('SELECT * FROM propiedades WHERE activo = 1').fetchall()
+    esquemas = esquemas_anio(conn, year)
+    
+    # Ingresos por propiedad y origen
+    ingresos = {}
+    for r in conn.execute(f'''
+        SELECT propiedad_id, origen, COALESCE(SUM(precio), 0) as total, COUNT(*) as noches
+        FROM {fuente(conn, 'ocupaciones', esquemas)}
+        WHERE strftime('%Y', fecha) = ?
+        GROUP BY propiedad_id, origen
+    ''', (str(year),)):
+        ingresos.setdefault(r['propiedad_id'], []).append(r)
+    
+    # Gastos por propiedad (NULL = gastos generales)
+    gastos = {r['propiedad_id']: r['total'] for r in conn.execute(f'''
+        SELECT propiedad_id, COALESCE(SUM(monto), 0) as total
+        FROM {fuente(conn, 'gastos', esquemas)}
+        WHERE strftime('%Y', fecha) = ?
+        GROUP BY propiedad_id
+    ''', (str(year),))}
+    # Los gastos generales no se reparten en la presentación de una sola propiedad
+    gastos_generales = 0 if propiedad else gastos.get(None, 0)
+    
+    filas = []
+    for p in props:
+        data = ingresos.get(p['id'], [])
+        por_origen = {d['origen']: d['total'] for d in data}
+        total = sum(d['total'] for d in data)
+        noches = sum(d['noches'] for d in data)
+        gasto = gastos.get(p['id'], 0)
+        filas.append({
+            'nombre': p['nombre'],
+            'color': COLORES_PROPIEDADES.get(p['nombre'], '#666'),
+            'ingresos': total,
+            'gastos': gasto,
+            'rentabilidad': total - gasto,
+            'noches': noches,
+            'ocupacion': (noches / 365) * 100,
+            'ticket': total / noches if noches > 0 else 0,
+            'dueno': por_origen.get('Dueño', 0),
+            'alicia': por_origen.get('Alicia', 0),
+            'estanislao': por_origen.get('Estanislao', 0),
+        })
     
     # Calcular totales
-    total_ingresos = sum(d['total'] for d in ingresos_data.values())
-    total_noches = sum(d['noches'] for d in ingresos_data.values())
-    total_gastos = sum(gastos_data.values()) + gastos_generales
+    total_ingresos = sum(f['ingresos'] for f in filas)
+    total_noches = sum(f['noches'] for f in filas)
+    total_gastos = sum(f['gastos'] for f in filas) + gastos_generales
     total_rentabilidad = total_ingresos - total_gastos
+    total_dueno = sum(f['dueno'] for f in filas)
+    total_alicia = sum(f['alicia'] for f in filas)
+    total_estanislao = sum(f['estanislao'] for f in filas)
+    
+    def porcentaje(valor):
+        return (valor / total_ingresos * 100) if total_ingresos > 0 else 0
     
-    # Colores
-    colores = {
-        'TIDES 14 B': '#3498db', 'TIDES 5 L': '#e74c3c', 'TIDES 10 L': '#2ecc71',
-        'TIDES 10 F': '#9b59b6', 'TIDES 12 F': '#f39c12',
-        'Brickell': '#1abc9c', 'Local 1': '#e67e22', 'Local 2': '#34495e'
+    return {
+        'year': year,
+        'propiedad': propiedad,
+        'filas': filas,
+        'departamentos': len([p for p in props if p['tipo'] == 'departamento']),
+        'locales': len([p for p in props if p['tipo'] == 'local']),
+        'total_ingresos': total_ingresos,
+        'total_gastos': total_gastos,
+        'total_rentabilidad': total_rentabilidad,
+        'total_noches': total_noches,
+        'total_dueno': total_dueno,
+        'total_alicia': total_alicia,
+        'total_estanislao': total_estanislao,
+        'margen': porcentaje(total_rentabilidad),
+        'porcentaje_dueno': porcentaje(total_dueno),
+        'porcentaje_terceros': porcentaje(total_alicia + total_estanislao),
+        'ocupacion_promedio': (total_noches / (365 * len(props)) * 100) if props else 0,
+        'ticket_promedio': total_ingresos / total_noches if total_noches > 0 else 0,
+        'generado': datetime.now().strftime('%d/%m/%Y %H:%M'),
     }
+
+# El HTML cacheado lleva esta marca en lugar de la hora; se completa al servirlo
+MARCA_GENERADO = '__GENERADO__'
+
+def presentacion_cacheada(conn, year, version):
+    """Devuelve el HTML de la presentación: memoria, luego disco, luego render."""
+    clave = (portafolio_actual(), year)
+    cacheado = _cache_presentaciones.get(clave)
+    if cacheado and cacheado[0] == version:
+        return cacheado[1]
     
-    # Generar HTML
-    html = f'''<!DOCTYPE html>
-<html lang="es">
-<head>
-    <meta charset="UTF-8">
-    <title>Presentación Miami {year}</title>
-    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
-    <link href="https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;600;700&display=swap" rel="stylesheet">
-    <style>
-        *{{margin:0;padding:0;box-sizing:border-box}}
-        body{{font-family:'Poppins',sans-serif;background:linear-gradient(135deg,#1a1a2e,#16213e,#0f3460);color:#fff;min-height:100vh}}
-        .slide{{min-height:100vh;padding:60px 80px;page-break-after:always}}
-        .portada{{display:flex;flex-direction:column;justify-content:center;align-items:center;text-align:center}}
-        .portada h1{{font-size:3.5rem;font-weight:700;background:linear-gradient(90deg,#00d2ff,#3a7bd5);-webkit-background-clip:text;-webkit-text-fill-color:transparent;margin-bottom:20px}}
-        .portada h2{{font-size:1.8rem;font-weight:300;color:#8892b0;margin-bottom:40px}}
-        .portada .loc{{font-size:1.3rem;color:#64ffda}}
-        .slide-title{{font-size:2.2rem;font-weight:600;margin-bottom:40px;color:#64ffda;border-left:4px solid #64ffda;padding-left:20px}}
-        .kpi-grid{{display:grid;grid-template-columns:repeat(4,1fr);gap:25px;margin-bottom:40px}}
-        .kpi{{background:rgba(255,255,255,0.05);border-radius:16px;padding:25px;text-align:center;border:1px solid rgba(255,255,255,0.1)}}
-        .kpi-val{{font-size:2rem;font-weight:700;color:#64ffda}}
-        .kpi-lab{{font-size:0.85rem;color:#8892b0;text-transform:uppercase;margin-top:5px}}
-        .kpi.warn .kpi-val{{color:#e74c3c}}
-        .tabla{{background:rgba(255,255,255,0.03);border-radius:16px;padding:20px;margin-bottom:30px}}
-        table{{width:100%;border-collapse:collapse}}
-        th{{background:rgba(100,255,218,0.1);padding:12px 15px;text-align:left;color:#64ffda;font-size:0.85rem}}
-        td{{padding:12px 15px;border-bottom:1px solid rgba(255,255,255,0.05)}}
-        .pos{{color:#2ecc71}}.neg{{color:#e74c3c}}
-        .charts{{display:grid;grid-template-columns:1fr 1fr;gap:25px;margin-top:30px}}
-        .chart-box{{background:rgba(255,255,255,0.03);border-radius:16px;padding:20px}}
-        .chart-title{{font-size:1rem;margin-bottom:15px;color:#8892b0}}
-        .footer{{text-align:center;padding:20px;color:#8892b0;font-size:0.9rem}}
-        @media print{{.slide{{page-break-after:always}}}}
-    </style>
-</head>
-<body>
-
-<div class="slide portada">
-    <h1>Resumen Anual {year}</h1>
-    <h2>Propiedades Miami</h2>
-    <div class="loc">📍 Miami, Florida</div>
-    <p style="margin-top:30px;color:#8892b0">{len([p for p in props if p['tipo']=='departamento'])} Departamentos + {len([p for p in props if p['tipo']=='local'])} Locales</p>
-    <p style="margin-top:50px;color:#64ffda;font-size:1.2rem">Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}</p>
-</div>
-
-<div class="slide">
-    <h2 class="slide-title">Resumen Ejecutivo</h2>
-    <div class="kpi-grid">
-        <div class="kpi"><div class="kpi-val">${total_ingresos:,.0f}</div><div class="kpi-lab">Ingresos Totales</div></div>
-        <div class="kpi warn"><div class="kpi-val">${total_gastos:,.0f}</div><div class="kpi-lab">Gastos Totales</div></div>
-        <div class="kpi"><div class="kpi-val">${total_rentabilidad:,.0f}</div><div class="kpi-lab">Rentabilidad</div></div>
-        <div class="kpi"><div class="kpi-val">{(total_rentabilidad/total_ingresos*100) if total_ingresos > 0 else 0:.1f}%</div><div class="kpi-lab">Margen</div></div>
-    </div>
-    <div class="kpi-grid">
-        <div class="kpi"><div class="kpi-val">{total_noches}</div><div class="kpi-lab">Noches Ocupadas</div></div>
-        <div class="kpi"><div class="kpi-val">{(total_noches/(365*len(props))*100):.1f}%</div><div class="kpi-lab">Ocupación Promedio</div></div>
-        <div class="kpi"><div class="kpi-val">${total_ingresos/total_noches if total_noches > 0 else 0:.0f}</div><div class="kpi-lab">Ticket Promedio</div></div>
-        <div class="kpi"><div class="kpi-val">{len(props)}</div><div class="kpi-lab">Propiedades</div></div>
-    </div>
-</div>
-
-<div class="slide">
-    <h2 class="slide-title">Detalle por Propiedad</h2>
-    <div class="tabla">
-        <table>
-            <tr><th>Propiedad</th><th>Ingresos</th><th>Gastos</th><th>Rentabilidad</th><th>Noches</th><th>% Ocup</th><th>Ticket</th></tr>'''
+    directorio = directorio_portafolio(CACHE_DIR, clave[0])
+    os.makedirs(directorio, exist_ok=True)
+    prefijo = f'presentacion_{year}_'
+    ruta = os.path.join(directorio, f'{prefijo}{version}.html')
+    if os.path.exists(ruta):
+        with open(ruta, encoding='utf-8') as f:
+            html = f.read()
+    else:
+        html = render_template('presentacion.html', **dict(datos_presentacion(conn, year), generado=MARCA_GENERADO))
+        tmp = f'{ruta}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(tmp, ruta)
+        # Borrar versiones viejas del mismo año
+        for nombre in os.listdir(directorio):
+            if nombre.startswith(prefijo) and nombre.endswith('.html') and nombre != os.path.basename(ruta):
+                try:
+                    os.remove(os.path.join(directorio, nombre))
+                except OSError:
+                    pass
     
-    for p in props:
-        nombre = p['nombre']
-        ing = ingresos_data.get(nombre, {'total': 0, 'noches': 0})
-        gast = gastos_data.get(nombre, 0)
-        rent = ing['total'] - gast
-        noches = ing['noches']
-        ticket = ing['total'] / noches if noches > 0 else 0
-        ocup = (noches / 365) * 100
-        color = colores.get(nombre, '#666')
-        cls = 'pos' if rent > 0 else 'neg'
-        
-        html += f'''<tr>
-            <td style="border-left:4px solid {color};padding-left:15px;font-weight:600">{nombre}</td>
-            <td>${ing['total']:,.0f}</td>
-            <td>${gast:,.0f}</td>
-            <td class="{cls}">${rent:,.0f}</td>
-            <td>{noches}</td>
-            <td>{ocup:.1f}%</td>
-            <td>${ticket:.0f}</td>
-        </tr>'''
-    
-    html += f'''<tr style="background:rgba(100,255,218,0.1);font-weight:600">
-            <td>TOTAL</td>
-            <td>${total_ingresos:,.0f}</td>
-            <td>${total_gastos:,.0f}</td>
-            <td class="pos">${total_rentabilidad:,.0f}</td>
-            <td>{total_noches}</td>
-            <td>{(total_noches/(365*len(props))*100):.1f}%</td>
-            <td>${total_ingresos/total_noches if total_noches > 0 else 0:.0f}</td>
-        </tr>
-        </table>
-    </div>
-</div>
-
-<div class="slide">
-    <h2 class="slide-title">Ingresos por Origen</h2>
-    <div class="tabla">
-        <table>
-            <tr><th>Propiedad</th><th>Dueño</th><th>Alicia</th><th>Estanislao</th><th>Total</th></tr>'''
-    
-    total_dueño = total_alicia = total_estanislao = 0
-    for p in props:
-        nombre = p['nombre']
-        ing = ingresos_data.get(nombre, {'total': 0, 'por_origen': {}})
-        dueño = ing['por_origen'].get('Dueño', 0)
-        alicia = ing['por_origen'].get('Alicia', 0)
-        estanislao = ing['por_origen'].get('Estanislao', 0)
-        total_dueño += dueño
-        total_alicia += alicia
-        total_estanislao += estanislao
+    _cache_presentaciones[clave] = (version, html)
+    return html
+
+@app.route('/api/presentacion/<int:year>')
+def generar_presentacion(year):
+    conn = get_db()
+    try:
+        # La versión se lee antes que los datos: si hay una escritura en el medio,
+        # a lo sumo se vuelve a generar en el próximo pedido.
+        version = version_datos(conn, TABLAS_PRESENTACION)
+        etag = f'presentacion-{portafolio_actual()}-{year}-{version}'
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            html = presentacion_cacheada(conn, year, version)
+            resp = Response(html.replace(MARCA_GENERADO, datetime.now().strftime('%d/%m/%Y %H:%M')),
+                            mimetype='text/html')
+    finally:
+        conn.close()
+    
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+# === BACKUPS (API de backup online de SQLite, por pasos) ===
+
+def _copiar_base(origen, destino):
+    """Copia online de `origen` a `destino`, de a BACKUP_PAGINAS páginas con pausas."""
+    src = sqlite3.connect(f'file:{origen}?mode=ro', uri=True)
+    dst = sqlite3.connect(destino)
+    try:
+        # Fijar un snapshot WAL: sin esto cada escritura concurrente reinicia la copia
+        src.execute('BEGIN')
+        src.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        src.backup(dst, pages=BACKUP_PAGINAS, sleep=BACKUP_PAUSA)
+        src.rollback()
+    finally:
+        dst.close()
+        src.close()
+
+def _comprimir(tmp, ruta):
+    try:
+        with open(tmp, 'rb') as f, gzip.open(f'{ruta}.tmp', 'wb', compresslevel=6) as g:
+            shutil.copyfileobj(f, g, 1024 * 1024)
+        os.replace(f'{ruta}.tmp', ruta)
+    finally:
+        os.remove(tmp)
+
+def _anios_archivados(conn):
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'anios_archivados'").fetchone():
+        return []
+    return conn.execute('SELECT anio, archivo FROM anios_archivados ORDER BY anio').fetchall()
+
+def _directorio_archivos_backup(ruta):
+    """Carpeta con los años archivados de un snapshot: alquileres_<ts>.archivo/"""
+    return ruta[:-len('.db.gz')] + '.archivo'
+
+def hacer_backup(origen=DB_PATH, destino_dir=BACKUP_DIR, retencion=BACKUP_RETENCION):
+    """Copia la base en vivo a un .db.gz sin frenar a los escritores.
+    
+    La copia avanza de a BACKUP_PAGINAS páginas con una pausa entre pasos,
+    así cada lectura dura pocos milisegundos. Los años archivados que registra
+    la copia van al lado, en alquileres_<ts>.archivo/. Devuelve la ruta del snapshot.
+    """
+    os.makedirs(destino_dir, exist_ok=True)
+    nombre = f'alquileres_{datetime.now().strftime("%Y%m%d_%H%M%S_%f")}.db'
+    tmp = os.path.join(destino_dir, f'{nombre}.tmp')
+    ruta = os.path.join(destino_dir, f'{nombre}.gz')
+    
+    try:
+        _copiar_base(origen, tmp)
+        copia = sqlite3.connect(tmp)
+        try:
+            archivados = _anios_archivados(copia)
+        finally:
+            copia.close()
+        # Los años archivados primero: el .db.gz aparece recién con el snapshot completo
+        for anio, archivo in archivados:
+            # Sin el archivo igual se guarda la base: verificar_backup marca el snapshot incompleto
+            if not os.path.exists(archivo):
+                app.logger.warning(f'Backup sin el año archivado {anio}: no existe {archivo}')
+                continue
+            directorio = _directorio_archivos_backup(ruta)
+            os.makedirs(directorio, exist_ok=True)
+            tmp_anio = os.path.join(directorio, f'alquileres_{anio}.db.tmp')
+            _copiar_base(archivo, tmp_anio)
+            _comprimir(tmp_anio, os.path.join(directorio, f'alquileres_{anio}.db.gz'))
+        _comprimir(tmp, ruta)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        shutil.rmtree(_directorio_archivos_backup(ruta), ignore_errors=True)
+        raise
+    
+    rotar_backups(destino_dir, retencion)
+    return ruta
+
+def listar_backups(destino_dir=BACKUP_DIR):
+    if not os.path.isdir(destino_dir):
+        return []
+    return sorted(os.path.join(destino_dir, n) for n in os.listdir(destino_dir)
+                  if n.startswith('alquileres_') and n.endswith('.db.gz'))
+
+def rotar_backups(destino_dir=BACKUP_DIR, retencion=BACKUP_RETENCION):
+    # Siempre queda al menos el último: con 0, [:-0 or None] borraría todos
+    for ruta in listar_backups(destino_dir)[:-max(1, retencion)]:
+        os.remove(ruta)
+        shutil.rmtree(_directorio_archivos_backup(ruta), ignore_errors=True)
+
+def _descomprimir_backup(ruta, directorio, nombre='restaurar.db'):
+    tmp = os.path.join(directorio, nombre)
+    with gzip.open(ruta, 'rb') as g, open(tmp, 'wb') as f:
+        shutil.copyfileobj(g, f, 1024 * 1024)
+    return tmp
+
+def verificar_backup(ruta):
+    """Descomprime el snapshot y sus años archivados y corre integrity_check. Devuelve (ok, detalle)."""
+    with tempfile.TemporaryDirectory() as d:
+        try:
+            conn = sqlite3.connect(_descomprimir_backup(ruta, d))
+        except (OSError, EOFError) as e:
+            return False, str(e)
+        try:
+            resultado = conn.execute('PRAGMA integrity_check').fetchone()[0]
+            if resultado != 'ok':
+                return False, resultado
+            tablas = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            faltantes = {'propiedades', 'ocupaciones', 'gastos', 'alquileres_mensuales'} - tablas
+            if faltantes:
+                return False, f'Faltan tablas: {", ".join(sorted(faltantes))}'
+            noches = conn.execute('SELECT COUNT(*) FROM ocupaciones').fetchone()[0]
+            archivados = _anios_archivados(conn)
+        except sqlite3.DatabaseError as e:
+            return False, str(e)
+        finally:
+            conn.close()
         
-        html += f'''<tr>
-            <td>{nombre}</td>
-            <td>${dueño:,.0f}</td>
-            <td>${alicia:,.0f}</td>
-            <td>${estanislao:,.0f}</td>
-            <td><strong>${ing['total']:,.0f}</strong></td>
-        </tr>'''
-    
-    html += f'''<tr style="background:rgba(100,255,218,0.1);font-weight:600">
-            <td>TOTAL</td>
-            <td>${total_dueño:,.0f}</td>
-            <td>${total_alicia:,.0f}</td>
-            <td>${total_estanislao:,.0f}</td>
-            <td><strong>${total_ingresos:,.0f}</strong></td>
-        </tr>
-        </table>
-    </div>
-    
-    <div class="charts">
-        <div class="chart-box">
-            <div class="chart-title">📊 Distribución por Origen</div>
-            <canvas id="chart1"></canvas>
-        </div>
-        <div class="chart-box">
-            <div class="chart-title">📈 Ingresos por Propiedad</div>
-            <canvas id="chart2"></canvas>
-        </div>
-    </div>
-</div>
-
-<div class="slide">
-    <h2 class="slide-title">Conclusiones</h2>
-    <div style="font-size:1.2rem">
-        <div style="padding:25px 0;border-bottom:1px solid rgba(255,255,255,0.1)">
-            ✅ <strong>Rentabilidad Total:</strong> ${total_rentabilidad:,.0f} ({(total_rentabilidad/total_ingresos*100) if total_ingresos > 0 else 0:.1f}% margen)
-        </div>
-        <div style="padding:25px 0;border-bottom:1px solid rgba(255,255,255,0.1)">
-            📊 <strong>Ingresos por Dueño:</strong> ${total_dueño:,.0f} ({(total_dueño/total_ingresos*100) if total_ingresos > 0 else 0:.1f}%)
-        </div>
-        <div style="padding:25px 0;border-bottom:1px solid rgba(255,255,255,0.1)">
-            👥 <strong>Ingresos por Terceros:</strong> ${total_alicia + total_estanislao:,.0f} ({((total_alicia + total_estanislao)/total_ingresos*100) if total_ingresos > 0 else 0:.1f}%)
-        </div>
-        <div style="padding:25px 0;border-bottom:1px solid rgba(255,255,255,0.1)">
-            🛏️ <strong>Ocupación:</strong> {total_noches} noches ({(total_noches/(365*len(props))*100):.1f}% promedio)
-        </div>
-        <div style="padding:25px 0">
-            💵 <strong>Ticket Promedio:</strong> ${total_ingresos/total_noches if total_noches > 0 else 0:.0f} por noche
-        </div>
-    </div>
-</div>
-
-<div class="footer">
-    Generado automáticamente desde Plataforma Alquileres Miami | {datetime.now().strftime('%d/%m/%Y %H:%M')}
-</div>
-
-<script>
-Chart.defaults.color = '#8892b0';
-new Chart(document.getElementById('chart1'), {{
-    type: 'doughnut',
-    data: {{
-        labels: ['Dueño', 'Alicia', 'Estanislao'],
-        datasets: [{{
-            data: [{total_dueño}, {total_alicia}, {total_estanislao}],
-            backgroundColor: ['#2ecc71', '#9b59b6', '#f1c40f']
-        }}]
-    }}
-}});
-
-new Chart(document.getElementById('chart2'), {{
-    type: 'bar',
-    data: {{
-        labels: {json.dumps([p['nombre'] for p in props])},
-        datasets: [{{
-            data: {json.dumps([ingresos_data.get(p['nombre'], {}).get('total', 0) for p in props])},
-            backgroundColor: {json.dumps([colores.get(p['nombre'], '#666') for p in props])}
-        }}]
-    }},
-    options: {{ plugins: {{ legend: {{ display: false }} }} }}
-}});
-</script>
-</body>
-</html>'''
-    
-    return Response(html, mimetype='text/html')
+        for anio, _ in archivados:
+            ruta_anio = os.path.join(_directorio_archivos_backup(ruta), f'alquileres_{anio}.db.gz')
+            if not os.path.exists(ruta_anio):
+                return False, f'Falta el año archivado {anio}'
+            try:
+                conn = sqlite3.connect(_descomprimir_backup(ruta_anio, d, f'alquileres_{anio}.db'))
+            except (OSError, EOFError) as e:
+                return False, f'{anio}: {e}'
+            try:
+                resultado = conn.execute('PRAGMA integrity_check').fetchone()[0]
+                if resultado != 'ok':
+                    return False, f'{anio}: {resultado}'
+            except sqlite3.DatabaseError as e:
+                return False, f'{anio}: {e}'
+            finally:
+                conn.close()
+        if archivados:
+            return True, f'{noches} ocupaciones, {len(archivados)} años archivados'
+        return True, f'{noches} ocupaciones'
+
+def restaurar_backup(ruta, destino=DB_PATH, destino_backups=BACKUP_DIR, destino_cache=None):
+    """Verifica el snapshot y lo vuelca sobre la base en vivo (con backup previo).
+    
+    Los años archivados del snapshot vuelven a los archivos que registra. La base
+    restaurada recibe una época nueva, así ningún worker confunde sus versiones
+    con las de antes del restore; `destino_cache` se vacía.
+    """
+    ok, detalle = verificar_backup(ruta)
+    if not ok:
+        raise ValueError(f'Backup inválido: {detalle}')
+    previo = hacer_backup(destino, destino_backups)
+    with tempfile.TemporaryDirectory() as d:
+        src = sqlite3.connect(_descomprimir_backup(ruta, d))
+        try:
+            for anio, archivo in _anios_archivados(src):
+                ruta_anio = os.path.join(_directorio_archivos_backup(ruta), f'alquileres_{anio}.db.gz')
+                os.makedirs(os.path.dirname(archivo) or '.', exist_ok=True)
+                a_src = sqlite3.connect(_descomprimir_backup(ruta_anio, d, f'alquileres_{anio}.db'))
+                a_dst = sqlite3.connect(archivo)
+                try:
+                    a_src.backup(a_dst)
+                finally:
+                    a_dst.close()
+                    a_src.close()
+            dst = sqlite3.connect(destino)
+            try:
+                src.backup(dst)
+                with dst:
+                    dst.execute("INSERT OR REPLACE INTO versiones (tabla, version) VALUES ('epoca', ?)",
+                                (nueva_epoca(),))
+            finally:
+                dst.close()
+        finally:
+            src.close()
+    if destino_cache:
+        shutil.rmtree(destino_cache, ignore_errors=True)
+    return previo
+
+def _backups_programados():
+    intervalo = BACKUP_INTERVALO_HORAS * 3600
+    lock_path = os.path.join(BACKUP_DIR, '.lock')
+    while True:
+        time.sleep(60)
+        try:
+            os.makedirs(BACKUP_DIR, exist_ok=True)
+            with open(lock_path, 'a') as lock:
+                # Con varios workers de gunicorn, solo uno hace el backup
+                if fcntl:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue
+                for portafolio in listar_portafolios():
+                    directorio = directorio_portafolio(BACKUP_DIR, portafolio)
+                    existentes = listar_backups(directorio)
+                    if existentes and time.time() - os.path.getmtime(existentes[-1]) < intervalo:
+                        continue
+                    hacer_backup(ruta_db(portafolio), directorio)
+        except Exception as e:
+            app.logger.error(f'Backup programado falló: {e}')
+
+def iniciar_backups_programados():
+    # Los procesos hijos (pool de reportes) importan este módulo: no repiten el hilo
+    if BACKUP_INTERVALO_HORAS > 0 and multiprocessing.parent_process() is None:
+        threading.Thread(target=_backups_programados, name='backups', daemon=True).start()
+
+iniciar_backups_programados()
+
+@app.cli.command('backup')
+@click.option('--portafolio', default=PORTAFOLIO_PRINCIPAL, show_default=True, callback=validar_portafolio)
+def backup_command(portafolio):
+    """Hace un snapshot comprimido de la base: flask --app app backup"""
+    ruta = hacer_backup(ruta_db(portafolio), directorio_portafolio(BACKUP_DIR, portafolio))
+    click.echo(f'Backup creado: {ruta}')
+
+@app.cli.command('verificar-backup')
+@click.argument('ruta')
+def verificar_backup_command(ruta):
+    ok, detalle = verificar_backup(ruta)
+    click.echo(f'{"OK" if ok else "ERROR"}: {detalle}')
+    if not ok:
+        raise SystemExit(1)
+
+@app.cli.command('restaurar-backup')
+@click.argument('ruta')
+@click.option('--portafolio', default=PORTAFOLIO_PRINCIPAL, show_default=True, callback=validar_portafolio)
+def restaurar_backup_command(ruta, portafolio):
+    previo = restaurar_backup(ruta, ruta_db(portafolio), directorio_portafolio(BACKUP_DIR, portafolio),
+                              directorio_portafolio(CACHE_DIR, portafolio))
+    click.echo(f'Restaurado {ruta} (estado anterior guardado en {previo})')
+
+# === PAQUETES DE REPORTES (Excel + presentación por propiedad y año, en paralelo) ===
+
+PAQUETE_PROCESOS = int(os.environ.get('PAQUETE_PROCESOS', 0)) or os.cpu_count() or 1
+
+_pool_reportes = None
+_pool_reportes_lock = threading.Lock()
+
+def _nuevo_pool(procesos):
+    # spawn y no fork: el worker que pide el paquete tiene hilos (gthread, backups)
+    # y conexiones SQLite abiertas que un fork copiaría a medio usar
+    return ProcessPoolExecutor(max_workers=max(1, procesos), mp_context=multiprocessing.get_context('spawn'))
+
+def pool_reportes():
+    """Pool compartido por los pedidos HTTP del worker; se crea la primera vez que se usa."""
+    global _pool_reportes
+    with _pool_reportes_lock:
+        if _pool_reportes is None:
+            _pool_reportes = _nuevo_pool(PAQUETE_PROCESOS)
+        return _pool_reportes
+
+def _descartar_pool_reportes(pool):
+    global _pool_reportes
+    with _pool_reportes_lock:
+        if _pool_reportes is pool:
+            _pool_reportes = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def generar_reporte(propiedad, year, portafolio=PORTAFOLIO_PRINCIPAL):
+    """Tarea de un proceso del pool: usa su propia conexión de solo lectura."""
+    conn = get_db_lectura(portafolio)
+    try:
+        excel = io.BytesIO()
+        generar_excel(conn, f'{year}-01-01', f'{year}-12-31', propiedad).save(excel)
+        with app.app_context():
+            html = render_template('presentacion.html', **datos_presentacion(conn, year, propiedad))
+    finally:
+        conn.close()
+    return propiedad, year, excel.getvalue(), html.encode('utf-8')
+
+class _SalidaZip:
+    """Destino no buscable para ZipFile: junta los bytes hasta que se los pide."""
+    def __init__(self):
+        self.partes = []
+    
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+    
+    def flush(self):
+        pass
+    
+    def sacar(self):
+        datos = b''.join(self.partes)
+        self.partes.clear()
+        return datos
+
+def generar_paquete(propiedades, anios, procesos=None, portafolio=PORTAFOLIO_PRINCIPAL):
+    """Genera los reportes en un pool de procesos y va emitiendo el ZIP a medida que terminan.
+    
+    Sin `procesos` usa el pool compartido. Un reporte que falla no corta el ZIP (la
+    respuesta ya salió con 200): queda un ERROR.txt en su carpeta.
+    """
+    tareas = [(p, y) for y in anios for p in propiedades]
+    propio = procesos is not None
+    pool = _nuevo_pool(min(procesos, len(tareas))) if propio else pool_reportes()
+    salida = _SalidaZip()
+    futuros = {}
+    try:
+        with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as zf:
+            futuros = {pool.submit(generar_reporte, p, y, portafolio): (p, y) for p, y in tareas}
+            for futuro in as_completed(futuros):
+                propiedad, year = futuros[futuro]
+                nombre = propiedad.replace(' ', '_')
+                try:
+                    _, _, excel, html = futuro.result()
+                except Exception as e:
+                    app.logger.error(f'Reporte {propiedad} {year} falló: {e!r}')
+                    if isinstance(e, BrokenProcessPool) and not propio:
+                        _descartar_pool_reportes(pool)
+                    zf.writestr(f'{year}/{nombre}/ERROR.txt', f'No se pudo generar el reporte: {e!r}\n')
+                else:
+                    zf.writestr(f'{year}/{nombre}/Reporte_{nombre}_{year}.xlsx', excel)
+                    zf.writestr(f'{year}/{nombre}/Presentacion_{nombre}_{year}.html', html)
+                yield salida.sacar()
+        yield salida.sacar()
+    finally:
+        # Si el cliente cortó la descarga, lo pendiente no sigue ocupando el pool
+        for futuro in futuros:
+            futuro.cancel()
+        if propio:
+            pool.shutdown(cancel_futures=True)
+
+def _parametros_paquete(propiedades, anios, portafolio=None):
+    conn = get_db(portafolio)
+    validas = [p['nombre'] for p in conn.execute('SELECT nombre FROM propiedades WHERE activo = 1')]
+    conn.close()
+    propiedades = [p for p in propiedades if p in validas] if propiedades else validas
+    return propiedades, anios or [datetime.now().year]
+
+@app.route('/api/exportar/paquete')
+def exportar_paquete():
+    propiedades = [p for p in request.args.get('propiedades', '').split(',') if p]
+    try:
+        anios = [int(a) for a in request.args.get('anios', '').split(',') if a]
+    except ValueError:
+        return jsonify({'error': 'Años inválidos'}), 400
+    propiedades, anios = _parametros_paquete(propiedades, anios)
+    if not propiedades:
+        return jsonify({'error': 'Propiedad no encontrada'}), 400
+    
+    nombre = f'Reportes_Miami_{min(anios)}_{max(anios)}.zip'
+    return Response(generar_paquete(propiedades, anios, portafolio=portafolio_actual()), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename={nombre}'})
+
+@app.cli.command('paquete')
+@click.option('--anio', 'anios', type=int, multiple=True, help='Año a incluir (repetible)')
+@click.option('--propiedad', 'propiedades', multiple=True, help='Propiedad a incluir (repetible)')
+@click.option('--procesos', type=int, default=PAQUETE_PROCESOS, show_default=True)
+@click.option('-o', '--salida', default='data/Reportes_Miami.zip', show_default=True)
+@click.option('--portafolio', default=PORTAFOLIO_PRINCIPAL, show_default=True, callback=validar_portafolio)
+def paquete_command(anios, propiedades, procesos, salida, portafolio):
+    """Genera el ZIP con Excel y presentación por propiedad y año."""
+    propiedades, anios = _parametros_paquete(list(propiedades), list(anios), portafolio)
+    t0 = time.perf_counter()
+    with open(salida, 'wb') as f:
+        for parte in generar_paquete(propiedades, anios, procesos, portafolio):
+            f.write(parte)
+    click.echo(f'{len(propiedades) * len(anios)} reportes en {time.perf_counter() - t0:.2f}s '
+               f'con {procesos} procesos -> {salida}')
 
 if __name__ == '__main__':
     print("\n" + "="*50)
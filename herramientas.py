@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""Herramientas de medición, fuera de la app: python herramientas.py --help
+
+Los workers de gunicorn y los procesos del pool de reportes importan app.py;
+esto no. Los comandos importan `app` solo cuando necesitan algo de ella.
+"""
+from datetime import datetime, date, timedelta
+import sqlite3
+import click
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+@click.group()
+def cli():
+    pass
+
+# === PRUEBA DE CARGA (gunicorn + sesiones simuladas del dueño y los externos) ===
+
+CARGA_DEPTOS = ['TIDES 14 B', 'TIDES 5 L', 'TIDES 10 L', 'TIDES 10 F', 'TIDES 12 F']
+CARGA_MEZCLA = {'dueno': 5, 'alicia': 3, 'estanislao': 3, 'excel': 1}  # peso de cada tipo de sesión
+
+def _sesion_dueno(pedir, rnd, anio):
+    """El dueño recorre unos meses del calendario y mira los resúmenes."""
+    pedir('GET /', '/')
+    mes = rnd.randint(1, 10)
+    for m in range(mes, mes + 3):
+        pedir('GET /api/ocupaciones/<anio>/<mes>', f'/api/ocupaciones/{anio}/{m}')
+    pedir('GET /api/resumen/<anio>', f'/api/resumen/{anio}')
+    pedir('GET /api/ingresos-detalle/<anio>', f'/api/ingresos-detalle/{anio}')
+    pedir('GET /api/gastos-detalle/<anio>', f'/api/gastos-detalle/{anio}')
+    pedir('GET /api/alquileres-mensuales/<anio>', f'/api/alquileres-mensuales/{anio}')
+
+def _sesion_externo(origen):
+    """Alicia o Estanislao: abren su vista, cargan una estadía y hacen una selección múltiple."""
+    def sesion(pedir, rnd, anio):
+        pedir('GET /vista/<nombre>', f'/vista/{origen.lower()}')
+        ids = {p['nombre']: p['id'] for p in pedir('GET /api/propiedades', '/api/propiedades') or []}
+        mes = rnd.randint(1, 12)
+        pedir('GET /api/ocupaciones/<anio>/<mes>', f'/api/ocupaciones/{anio}/{mes}')
+        
+        inicio = date(anio, mes, rnd.randint(1, 21))
+        pedir('POST /api/cargar-externo', '/api/cargar-externo', {
+            'propiedad': rnd.choice(CARGA_DEPTOS),
+            'fecha_inicio': inicio.isoformat(),
+            'fecha_fin': (inicio + timedelta(days=rnd.randint(1, 6))).isoformat(),
+            'precio': rnd.randint(90, 250),
+            'inquilino': f'Huésped {rnd.randint(1, 9999)}',
+            'origen': origen,
+        })
+        
+        depto = rnd.choice(CARGA_DEPTOS)
+        if depto in ids:
+            inicio = date(anio, mes, rnd.randint(1, 21))
+            pedir('POST /api/ocupaciones/lote', '/api/ocupaciones/lote', {
+                'noches': [{'propiedad_id': ids[depto], 'fecha': (inicio + timedelta(days=i)).isoformat()}
+                           for i in range(rnd.randint(2, 7))],
+                'precio': rnd.randint(90, 250),
+                'origen': origen,
+                'notas': f'Huésped {rnd.randint(1, 9999)}',
+            })
+        pedir('GET /api/mis-cargas/<origen>', f'/api/mis-cargas/{origen}')
+    return sesion
+
+def _sesion_excel(pedir, rnd, anio):
+    pedir('GET /api/exportar/excel', f'/api/exportar/excel?desde={anio}-01-01&hasta={anio}-12-31')
+
+CARGA_SESIONES = {
+    'dueno': _sesion_dueno,
+    'alicia': _sesion_externo('Alicia'),
+    'estanislao': _sesion_externo('Estanislao'),
+    'excel': _sesion_excel,
+}
+
+def _pedir_http(base, ruta, datos=None):
+    """Devuelve (status, cuerpo, ms). status 0 = no hubo respuesta (conexión rechazada, timeout)."""
+    cuerpo = json.dumps(datos).encode('utf-8') if datos is not None else None
+    req = urllib.request.Request(base + ruta, data=cuerpo,
+                                 headers={'Content-Type': 'application/json'} if cuerpo else {})
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as r:
+            estado, texto = r.status, r.read()
+    except urllib.error.HTTPError as e:
+        estado, texto = e.code, e.read()
+    except OSError as e:
+        estado, texto = 0, str(e).encode('utf-8')
+    return estado, texto, (time.perf_counter() - t0) * 1000
+
+def _usuario_virtual(base, fin, semilla, pausa, anio, resultados):
+    """Hilo de un usuario: elige sesiones según CARGA_MEZCLA hasta que se termina el tiempo."""
+    rnd = random.Random(semilla)
+    nombres, pesos = zip(*CARGA_MEZCLA.items())
+    
+    def pedir(etiqueta, ruta, datos=None):
+        estado, texto, ms = _pedir_http(base, ruta, datos)
+        # Las rutas que atrapan la excepción devuelven el "database is locked" con un 400
+        bloqueo = b'database is locked' in texto
+        if estado == 0 or estado >= 500 or bloqueo:
+            resultado = 'error'
+        elif estado >= 400:
+            resultado = 'rechazo'
+        else:
+            resultado = 'ok'
+        resultados.append((etiqueta, ms, resultado, bloqueo))
+        if pausa:
+            time.sleep(rnd.uniform(0, 2 * pausa))
+        if resultado == 'ok' and texto[:1] in (b'[', b'{'):
+            return json.loads(texto)
+    
+    while time.monotonic() < fin:
+        CARGA_SESIONES[rnd.choices(nombres, pesos)[0]](pedir, rnd, anio)
+
+def _percentil(ordenados, q):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * q))]
+
+def _metricas(muestras, duracion):
+    ms = sorted(m[1] for m in muestras)
+    errores = sum(1 for m in muestras if m[2] == 'error')
+    return {
+        'requests': len(muestras),
+        'rps': round(len(muestras) / duracion, 2),
+        'p50_ms': round(_percentil(ms, 0.50), 1),
+        'p95_ms': round(_percentil(ms, 0.95), 1),
+        'p99_ms': round(_percentil(ms, 0.99), 1),
+        'max_ms': round(ms[-1], 1),
+        'errores': errores,
+        'error_rate': round(errores / len(muestras), 4),
+        'bloqueos': sum(1 for m in muestras if m[3]),
+        'rechazos': sum(1 for m in muestras if m[2] == 'rechazo'),
+    }
+
+def _levantar_gunicorn(directorio, workers, threads, log):
+    """Arranca gunicorn sobre una copia de data/ en `directorio` y espera a que responda."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        puerto = s.getsockname()[1]
+    # Inicializa la base antes, para no medir a los workers peleando por el CREATE TABLE
+    entorno = dict(os.environ, PYTHONPATH=RAIZ)
+    subprocess.run([sys.executable, '-c', 'import app'], cwd=directorio, env=entorno, check=True)
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app',
+                             '--workers', str(workers), '--threads', str(threads),
+                             '--bind', f'127.0.0.1:{puerto}', '--chdir', directorio,
+                             '--pythonpath', RAIZ],
+                            stdout=log, stderr=subprocess.STDOUT)
+    base = f'http://127.0.0.1:{puerto}'
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite and proc.poll() is None:
+        if _pedir_http(base, '/api/propiedades')[0] == 200:
+            return proc, base
+        time.sleep(0.2)
+    proc.terminate()
+    raise click.ClickException('gunicorn no arrancó (ver el log con --log)')
+
+def verificar_umbrales(resultado, umbrales):
+    """Compara contra {"global": {...}, "endpoints": {"GET /...": {...}}}.
+    
+    Cada clave es una métrica de _metricas y funciona como máximo; con prefijo min_ (p.ej.
+    "min_rps") es un mínimo. Devuelve la lista de violaciones.
+    """
+    violaciones = []
+    grupos = [('global', resultado['global'], umbrales.get('global', {}))]
+    grupos += [(e, resultado['endpoints'].get(e), lim) for e, lim in umbrales.get('endpoints', {}).items()]
+    for nombre, metricas, limites in grupos:
+        if metricas is None:
+            violaciones.append(f'{nombre}: sin requests')
+            continue
+        for clave, limite in limites.items():
+            minimo = clave.startswith('min_')
+            valor = metricas[clave[4:] if minimo else clave]
+            if (valor < limite) if minimo else (valor > limite):
+                violaciones.append(f'{nombre}: {clave[4:] if minimo else clave} = {valor} '
+                                   f'({"mínimo" if minimo else "máximo"} {limite})')
+    return violaciones
+
+@cli.command('carga')
+@click.option('--workers', default=1, show_default=True, help='Workers de gunicorn (el Procfile usa 1)')
+@click.option('--threads', default=1, show_default=True, help='Threads por worker (>1 usa gthread)')
+@click.option('--usuarios', default=10, show_default=True, help='Usuarios simultáneos')
+@click.option('--duracion', default=30.0, show_default=True, help='Segundos de prueba')
+@click.option('--pausa', default=0.2, show_default=True, help='Pausa media entre clicks, en segundos')
+@click.option('--anio', type=int, default=lambda: datetime.now().year, help='Año que se navega y carga')
+@click.option('--con-datos', is_flag=True, help='Partir de una copia de la base actual en vez de una vacía')
+@click.option('--semilla', default=1, show_default=True)
+@click.option('--umbrales', type=click.Path(exists=True, dir_okay=False), help='JSON de umbrales de regresión')
+@click.option('--salida', type=click.Path(dir_okay=False), help='Guardar los resultados en JSON')
+@click.option('--log', type=click.Path(dir_okay=False), help='Guardar la salida de gunicorn')
+def carga_command(workers, threads, usuarios, duracion, pausa, anio, con_datos, semilla, umbrales, salida, log):
+    """Prueba de carga: gunicorn + sesiones del dueño, Alicia, Estanislao y exportaciones.
+    
+    python herramientas.py carga --workers 2 --threads 4 --usuarios 20 --umbrales umbrales_carga.json
+    """
+    with tempfile.TemporaryDirectory() as d:
+        os.makedirs(os.path.join(d, 'data'))
+        if con_datos:
+            from app import DB_PATH, PORTAFOLIO_PRINCIPAL, get_db_lectura
+            origen, destino = get_db_lectura(PORTAFOLIO_PRINCIPAL), sqlite3.connect(os.path.join(d, DB_PATH))
+            origen.backup(destino)
+            origen.close()
+            destino.close()
+        ruta_log = os.path.join(d, 'gunicorn.log')
+        with open(ruta_log, 'wb') as f:
+            proc, base = _levantar_gunicorn(d, workers, threads, f)
+            try:
+                resultados = []
+                t0 = time.monotonic()
+                hilos = [threading.Thread(target=_usuario_virtual,
+                                          args=(base, t0 + duracion, semilla + i, pausa, anio, resultados))
+                         for i in range(usuarios)]
+                for h in hilos:
+                    h.start()
+                for h in hilos:
+                    h.join()
+                transcurrido = time.monotonic() - t0
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+        with open(ruta_log, 'rb') as f:
+            bloqueos_log = f.read().count(b'database is locked')
+        if log:
+            shutil.copyfile(ruta_log, log)
+    
+    if not resultados:
+        raise click.ClickException('No se completó ningún request')
+    por_endpoint = {}
+    for m in resultados:
+        por_endpoint.setdefault(m[0], []).append(m)
+    resultado = {
+        'config': {'workers': workers, 'threads': threads, 'usuarios': usuarios, 'duracion': round(transcurrido, 2),
+                   'pausa': pausa, 'anio': anio, 'con_datos': con_datos, 'semilla': semilla},
+        'global': dict(_metricas(resultados, transcurrido), bloqueos_log=bloqueos_log),
+        'endpoints': {e: _metricas(ms, transcurrido) for e, ms in sorted(por_endpoint.items())},
+    }
+    
+    click.echo(f'{workers} workers x {threads} threads, {usuarios} usuarios, {transcurrido:.1f}s')
+    click.echo(f'{"endpoint":40} {"n":>6} {"req/s":>7} {"p50":>8} {"p95":>8} {"p99":>8} {"max":>8} '
+               f'{"error%":>7} {"locked":>6} {"4xx":>5}')
+    for nombre, m in list(resultado['endpoints'].items()) + [('TOTAL', resultado['global'])]:
+        click.echo(f'{nombre:40} {m["requests"]:6} {m["rps"]:7.1f} {m["p50_ms"]:8.1f} {m["p95_ms"]:8.1f} '
+                   f'{m["p99_ms"]:8.1f} {m["max_ms"]:8.1f} {m["error_rate"] * 100:6.2f}% {m["bloqueos"]:6} '
+                   f'{m["rechazos"]:5}')
+    click.echo(f'"database is locked" en el log de gunicorn: {bloqueos_log}')
+    
+    if salida:
+        with open(salida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    if umbrales:
+        with open(umbrales, encoding='utf-8') as f:
+            violaciones = verificar_umbrales(resultado, json.load(f))
+        for v in violaciones:
+            click.echo(f'REGRESIÓN: {v}')
+        if violaciones:
+            raise SystemExit(1)
+        click.echo(f'Dentro de los umbrales de {umbrales}')
+
+# === BENCHMARK DE BACKUPS (latencia de escritura durante un backup online) ===
+
+@cli.command('benchmark-backup')
+@click.option('--filas', default=500000, help='Ocupaciones sintéticas en la base de prueba')
+def benchmark_backup_command(filas):
+    """Mide la latencia de escritura mientras corre un backup sobre una base grande."""
+    from app import hacer_backup
+    
+    with tempfile.TemporaryDirectory() as d:
+        ruta = os.path.join(d, 'bench.db')
+        conn = sqlite3.connect(ruta)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''CREATE TABLE ocupaciones (id INTEGER PRIMARY KEY, propiedad_id INTEGER,
+                        fecha DATE, precio REAL, origen TEXT, notas TEXT)''')
+        conn.executemany('INSERT INTO ocupaciones (propiedad_id, fecha, precio, origen, notas) VALUES (?, ?, ?, ?, ?)',
+                         ((i % 8, f'{2000 + i // 3000}-01-01', 150.0, 'Dueño', f'Inquilino {i}' * 4)
+                          for i in range(filas)))
+        conn.commit()
+        conn.close()
+        click.echo(f'Base sintética: {os.path.getsize(ruta) / 1e6:.1f} MB')
+        
+        def escritor(latencias, activo):
+            w = sqlite3.connect(ruta, timeout=30)
+            while activo.is_set():
+                t0 = time.perf_counter()
+                w.execute("INSERT INTO ocupaciones (propiedad_id, fecha, precio, origen) VALUES (1, '2030-01-01', 1, 'x')")
+                w.commit()
+                latencias.append((time.perf_counter() - t0) * 1000)
+                time.sleep(0.002)
+            w.close()
+        
+        def medir(con_backup):
+            latencias, activo = [], threading.Event()
+            activo.set()
+            t = threading.Thread(target=escritor, args=(latencias, activo))
+            t.start()
+            t0 = time.perf_counter()
+            if con_backup:
+                hacer_backup(ruta, os.path.join(d, 'backups'), retencion=1)
+            else:
+                time.sleep(2)
+            duracion = time.perf_counter() - t0
+            activo.clear()
+            t.join()
+            latencias.sort()
+            p = lambda q: latencias[min(len(latencias) - 1, int(len(latencias) * q))]
+            click.echo(f'{"Durante backup" if con_backup else "Sin backup":15} {duracion:6.2f}s  '
+                       f'escrituras={len(latencias):5}  p50={p(0.5):.2f}ms  p99={p(0.99):.2f}ms  '
+                       f'max={latencias[-1]:.2f}ms')
+        
+        medir(False)
+        medir(True)
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,152 @@
+// Configurar badge
+const badge = document.getElementById('badge');
+if (ORIGEN === 'Alicia') {
+    badge.style.background = 'rgba(155,89,182,0.3)';
+    badge.style.color = '#9b59b6';
+} else {
+    badge.style.background = 'rgba(241,196,15,0.3)';
+    badge.style.color = '#f1c40f';
+}
+
+function showTab(tab) {
+    document.querySelectorAll('.tab').forEach(t => t.classList.remove('active'));
+    document.querySelectorAll('.tab-content').forEach(t => t.classList.remove('active'));
+    document.querySelector(`.tab:nth-child(${tab === 'nueva' ? 1 : 2})`).classList.add('active');
+    document.getElementById('tab-' + tab).classList.add('active');
+    if (tab === 'mis') cargarMisCargas();
+}
+
+async function cargarMisCargas() {
+    const res = await fetch(BASE + '/api/mis-cargas/' + ORIGEN);
+    const cargas = await res.json();
+    const lista = document.getElementById('lista-cargas');
+
+    if (cargas.length === 0) {
+        lista.innerHTML = '<div class="empty">No tenés cargas todavía</div>';
+        return;
+    }
+
+    lista.innerHTML = cargas.map(c => `
+        <div class="carga-item">
+            <div class="carga-info">
+                <span class="prop">${c.propiedad}</span>
+                <span class="fecha">${c.fecha}</span>
+                <div class="inq">👤 ${c.notas || 'Sin nombre'}</div>
+            </div>
+            <span class="carga-precio">$${c.precio}</span>
+            <div class="carga-actions">
+                <button class="btn btn-edit btn-sm" title="Editar esta noche" onclick="editarCarga(${c.id}, ${c.precio}, '${c.notas || ''}', '${c.fecha}')">✏️</button>
+                <button class="btn btn-danger btn-sm" title="Borrar esta noche" onclick="borrarCarga(${c.id})">🗑️</button>
+                ${c.noches_grupo > 1 ? `
+                <button class="btn btn-edit btn-sm" title="Editar las ${c.noches_grupo} noches de la estadía" onclick="editarEstadia('${c.grupo}', ${c.precio}, '${c.notas || ''}', ${c.noches_grupo})">✏️ Estadía (${c.noches_grupo})</button>
+                <button class="btn btn-danger btn-sm" title="Borrar las ${c.noches_grupo} noches de la estadía" onclick="borrarEstadia('${c.grupo}', ${c.noches_grupo})">🗑️ Estadía (${c.noches_grupo})</button>` : ''}
+            </div>
+        </div>
+    `).join('');
+}
+
+function editarCarga(id, precio, inquilino, fecha) {
+    document.getElementById('edit-id').value = id;
+    document.getElementById('edit-form').dataset.grupo = '';
+    document.getElementById('edit-titulo').textContent = '✏️ Editar noche';
+    document.getElementById('edit-alcance').textContent = 'Se modifica solo la noche del ' + fecha;
+    document.getElementById('edit-precio').value = precio;
+    document.getElementById('edit-inquilino').value = inquilino;
+    document.getElementById('modal-edit').classList.add('show');
+}
+
+function editarEstadia(grupo, precio, inquilino, noches) {
+    document.getElementById('edit-id').value = '';
+    document.getElementById('edit-form').dataset.grupo = grupo;
+    document.getElementById('edit-titulo').textContent = '✏️ Editar estadía completa';
+    document.getElementById('edit-alcance').textContent = 'Se modifican las ' + noches + ' noches de la estadía';
+    document.getElementById('edit-precio').value = precio;
+    document.getElementById('edit-inquilino').value = inquilino;
+    document.getElementById('modal-edit').classList.add('show');
+}
+
+function closeModal() {
+    document.getElementById('modal-edit').classList.remove('show');
+}
+
+document.getElementById('edit-form').addEventListener('submit', async (e) => {
+    e.preventDefault();
+    const id = document.getElementById('edit-id').value;
+    const grupo = document.getElementById('edit-form').dataset.grupo;
+    // Con grupo (editarEstadia) se modifica la estadía completa en un solo request
+    const url = BASE + (grupo ? '/api/modificar-carga-grupo/' + grupo : '/api/modificar-carga/' + id);
+    const res = await fetch(url, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            precio: parseFloat(document.getElementById('edit-precio').value),
+            inquilino: document.getElementById('edit-inquilino').value,
+            origen: ORIGEN
+        })
+    });
+    const data = await res.json();
+    if (data.success) {
+        closeModal();
+        cargarMisCargas();
+    } else {
+        alert(data.error || 'Error al modificar');
+    }
+});
+
+async function borrarCarga(id) {
+    if (!confirm('¿Seguro que querés borrar esta carga?')) return;
+    const res = await fetch(BASE + '/api/borrar-carga/' + id + '/' + ORIGEN, { method: 'DELETE' });
+    const data = await res.json();
+    if (data.success) {
+        cargarMisCargas();
+    } else {
+        alert(data.error || 'Error al borrar');
+    }
+}
+
+async function borrarEstadia(grupo, noches) {
+    if (!confirm('¿Seguro que querés borrar las ' + noches + ' noches de esta estadía?')) return;
+    const res = await fetch(BASE + '/api/borrar-carga-grupo/' + grupo + '/' + ORIGEN, { method: 'DELETE' });
+    const data = await res.json();
+    if (data.success) {
+        cargarMisCargas();
+    } else {
+        alert(data.error || 'Error al borrar');
+    }
+}
+
+document.getElementById('cargar-form').addEventListener('submit', async (e) => {
+    e.preventDefault();
+
+    const data = {
+        propiedad: document.getElementById('propiedad').value,
+        fecha_inicio: document.getElementById('fecha-inicio').value,
+        fecha_fin: document.getElementById('fecha-fin').value,
+        precio: parseFloat(document.getElementById('precio').value),
+        inquilino: document.getElementById('inquilino').value,
+        origen: ORIGEN
+    };
+
+    const res = await fetch(BASE + '/api/cargar-externo', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(data)
+    });
+
+    const result = await res.json();
+
+    if (result.success) {
+        document.getElementById('msg-ok').textContent = '✅ Se cargaron ' + result.dias + ' noche(s)';
+        document.getElementById('msg-ok').classList.add('show');
+        document.getElementById('msg-err').classList.remove('show');
+        document.getElementById('cargar-form').reset();
+        setTimeout(() => document.getElementById('msg-ok').classList.remove('show'), 5000);
+    } else {
+        document.getElementById('msg-err').textContent = result.error || 'Error al guardar';
+        document.getElementById('msg-err').classList.add('show');
+    }
+});
+
+document.getElementById('modal-edit').addEventListener('click', (e) => {
+    if (e.target.id === 'modal-edit') closeModal();
+});
@@ -0,0 +1,1097 @@
+let propiedades = [];
+let selectedProperty = null;
+let selectedPropertyType = 'temporario';
+let currentYear = 2025;
+let currentMonth = 12;
+let ocupaciones = {};
+let selectedOrigen = null;
+let selectedDays = new Set();
+let ingresosData = [];
+let gastosData = [];
+let alquileresMensualesData = [];
+let dashboardRawData = null;
+const MESES = ['','Enero','Febrero','Marzo','Abril','Mayo','Junio','Julio','Agosto','Septiembre','Octubre','Noviembre','Diciembre'];
+
+document.addEventListener('DOMContentLoaded', () => {
+    loadPropiedades();
+    loadAll();
+    document.getElementById('gasto-fecha').valueAsDate = new Date();
+});
+
+function loadAll() {
+    currentYear = parseInt(document.getElementById('yearSelect').value);
+    loadDashboard();
+    loadGastos();
+    loadReportes();
+}
+
+async function loadPropiedades() {
+    const res = await fetch(BASE + '/api/propiedades');
+    propiedades = await res.json();
+
+    // Solo mensuales en la sección de Ocupación
+    const mensuales = propiedades.filter(p => p.tipo === 'mensual');
+    document.getElementById('property-list-mensual').innerHTML = mensuales.map(p => `
+        <div class="property-item" data-id="${p.id}" onclick="selectPropertyMensual(${p.id})">
+            🏢 ${p.nombre}
+        </div>
+    `).join('');
+
+    ['gasto-propiedad', 'filter-prop', 'filter-gasto-prop'].forEach(id => {
+        const el = document.getElementById(id);
+        if (el) {
+            const firstOpt = el.querySelector('option');
+            el.innerHTML = firstOpt ? firstOpt.outerHTML : '';
+            propiedades.forEach(p => {
+                el.innerHTML += `<option value="${p.nombre}">${p.nombre}</option>`;
+            });
+        }
+    });
+
+    // Seleccionar la primera propiedad mensual
+    if (mensuales.length > 0) selectPropertyMensual(mensuales[0].id);
+}
+
+function selectPropertyMensual(id) {
+    selectedProperty = id;
+    const prop = propiedades.find(p => p.id === id);
+    selectedPropertyType = 'mensual';
+
+    document.querySelectorAll('#property-list-mensual .property-item').forEach(el => {
+        el.classList.toggle('selected', el.dataset.id == id);
+    });
+
+    // Siempre mostrar formulario mensual
+    document.getElementById('calendar-mensual').style.display = 'block';
+    document.getElementById('mensual-propiedad-nombre').textContent = '🏢 ' + prop.nombre;
+    loadAlquileresMensuales();
+}
+
+async function loadCalendar() {
+    if (!selectedProperty) return;
+    const res = await fetch(`${BASE}/api/ocupaciones/${currentYear}/${currentMonth}`);
+    const data = await res.json();
+    ocupaciones = {};
+    data.forEach(o => { ocupaciones[`${o.propiedad_id}-${o.fecha}`] = o; });
+    renderCalendar();
+}
+
+function renderCalendar() {
+    const monthNames = ['Enero','Febrero','Marzo','Abril','Mayo','Junio','Julio','Agosto','Septiembre','Octubre','Noviembre','Diciembre'];
+    document.getElementById('calendar-month').textContent = `${monthNames[currentMonth-1]} ${currentYear}`;
+
+    const firstDay = new Date(currentYear, currentMonth - 1, 1);
+    const lastDay = new Date(currentYear, currentMonth, 0);
+    const startWeekDay = firstDay.getDay();
+    const totalDays = lastDay.getDate();
+
+    let html = ['Dom','Lun','Mar','Mié','Jue','Vie','Sáb'].map(d => `<div class="calendar-day-header">${d}</div>`).join('');
+    for (let i = 0; i < startWeekDay; i++) html += '<div class="calendar-day empty"></div>';
+
+    for (let day = 1; day <= totalDays; day++) {
+        const fecha = `${currentYear}-${String(currentMonth).padStart(2,'0')}-${String(day).padStart(2,'0')}`;
+        const key = `${selectedProperty}-${fecha}`;
+        const ocup = ocupaciones[key];
+
+        let classes = 'calendar-day';
+        let content = `<span class="day-num">${day}</span>`;
+
+        if (ocup) {
+            classes += ` ocupado-${ocup.origen.toLowerCase()}`;
+            // Mostrar nombre del inquilino (de las notas)
+            if (ocup.notas) {
+                content += `<span class="day-inquilino">${ocup.notas}</span>`;
+            }
+            if (ocup.precio > 0) content += `<span class="day-price">$${ocup.precio}</span>`;
+        }
+        if (selectedDays.has(fecha)) classes += ' selected-multi';
+
+        html += `<div class="${classes}" data-fecha="${fecha}" onclick="toggleDay('${fecha}')">${content}</div>`;
+    }
+    document.getElementById('calendar-grid').innerHTML = html;
+}
+
+function toggleDay(fecha) {
+    selectedDays.has(fecha) ? selectedDays.delete(fecha) : selectedDays.add(fecha);
+    updateSelectionBar();
+    renderCalendar();
+}
+
+function updateSelectionBar() {
+    const bar = document.getElementById('selection-bar');
+    document.getElementById('selected-count').textContent = selectedDays.size;
+    bar.classList.toggle('show', selectedDays.size > 0);
+}
+
+function clearSelection() {
+    selectedDays.clear();
+    updateSelectionBar();
+    renderCalendar();
+}
+
+function openMultiModal() {
+    if (selectedDays.size === 0) return;
+    const prop = propiedades.find(p => p.id === selectedProperty);
+    const fechas = Array.from(selectedDays).sort();
+
+    document.getElementById('modal-title').textContent = fechas.length === 1 ? `${prop.nombre} - ${fechas[0]}` : `${prop.nombre} - ${fechas.length} días`;
+
+    const key = `${selectedProperty}-${fechas[0]}`;
+    const ocup = ocupaciones[key];
+
+    if (ocup && fechas.length === 1) {
+        document.getElementById('ocup-precio').value = ocup.precio;
+        document.getElementById('ocup-notas').value = ocup.notas || '';
+        document.getElementById('btn-eliminar').style.display = 'block';
+        document.querySelectorAll('.origen-btn').forEach(btn => {
+            btn.classList.toggle('selected', btn.dataset.origen === ocup.origen);
+            if (btn.dataset.origen === ocup.origen) selectedOrigen = ocup.origen;
+        });
+    } else {
+        document.getElementById('ocup-precio').value = '';
+        document.getElementById('ocup-notas').value = '';
+        document.getElementById('btn-eliminar').style.display = 'none';
+        document.querySelectorAll('.origen-btn').forEach(btn => btn.classList.remove('selected'));
+        selectedOrigen = null;
+    }
+    document.getElementById('ocupacion-modal').classList.add('show');
+}
+
+function selectOrigen(btn) {
+    document.querySelectorAll('.origen-btn').forEach(b => b.classList.remove('selected'));
+    btn.classList.add('selected');
+    selectedOrigen = btn.dataset.origen;
+}
+
+function selectMultiOrigen(btn) {
+    document.querySelectorAll('#multi-general-modal .origen-btn').forEach(b => b.classList.remove('selected'));
+    btn.classList.add('selected');
+    document.getElementById('multi-origen').value = btn.dataset.origen;
+}
+
+function selectEditOrigen(btn) {
+    document.querySelectorAll('#edit-ocup-modal .origen-btn').forEach(b => b.classList.remove('selected'));
+    btn.classList.add('selected');
+    document.getElementById('edit-ocup-origen').value = btn.dataset.origen;
+}
+
+function openEditOcup(infoStr) {
+    const info = typeof infoStr === 'string' ? JSON.parse(infoStr) : infoStr;
+
+    document.getElementById('edit-ocup-id').value = info.id;
+    document.getElementById('edit-ocup-propid').value = info.propId;
+    document.getElementById('edit-ocup-fecha').value = info.fecha;
+    document.getElementById('edit-ocup-precio').value = info.precio;
+    document.getElementById('edit-ocup-notas').value = info.notas || '';
+    document.getElementById('edit-ocup-origen').value = info.origen;
+
+    document.getElementById('edit-ocup-info').innerHTML = `<strong>${info.prop}</strong> - ${info.fecha}`;
+
+    // Marcar el botón de origen correcto
+    document.querySelectorAll('#edit-ocup-modal .origen-btn').forEach(b => {
+        b.classList.toggle('selected', b.dataset.origen === info.origen);
+    });
+
+    document.getElementById('edit-ocup-modal').classList.add('show');
+}
+
+async function submitEditOcup() {
+    const id = document.getElementById('edit-ocup-id').value;
+    const precio = parseFloat(document.getElementById('edit-ocup-precio').value);
+    const origen = document.getElementById('edit-ocup-origen').value;
+    const notas = document.getElementById('edit-ocup-notas').value;
+
+    if (!precio || precio <= 0) { showToast('Ingresá un precio válido', 'error'); return; }
+    if (!origen) { showToast('Seleccioná quién alquiló', 'error'); return; }
+
+    await fetch(`${BASE}/api/ocupacion/${id}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ precio, origen, notas })
+    });
+
+    document.getElementById('edit-ocup-modal').classList.remove('show');
+    loadCalendarioGeneral();
+    loadAll();
+    showToast('Ocupación actualizada', 'success');
+}
+
+async function deleteOcup() {
+    if (!confirm('¿Seguro que querés eliminar esta ocupación?')) return;
+
+    const propId = document.getElementById('edit-ocup-propid').value;
+    const fecha = document.getElementById('edit-ocup-fecha').value;
+
+    await fetch(`${BASE}/api/ocupacion/${propId}/${fecha}`, { method: 'DELETE' });
+
+    document.getElementById('edit-ocup-modal').classList.remove('show');
+    loadCalendarioGeneral();
+    loadAll();
+    showToast('Ocupación eliminada', 'success');
+}
+
+document.getElementById('ocupacion-form').addEventListener('submit', async (e) => {
+    e.preventDefault();
+    if (!selectedOrigen) { showToast('Seleccioná quién lo alquiló', 'error'); return; }
+
+    const precio = parseFloat(document.getElementById('ocup-precio').value) || 0;
+    const notas = document.getElementById('ocup-notas').value;
+    const noches = [...selectedDays].map(fecha => ({ propiedad_id: selectedProperty, fecha }));
+
+    const res = await fetch(BASE + '/api/ocupaciones/lote', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({ noches, precio, origen: selectedOrigen, notas })
+    });
+    const result = await res.json();
+    if (!result.success) { showToast(result.error || 'Error al guardar', 'error'); return; }
+
+    showToast(`${result.noches} días guardados ✓`);
+    closeModal('ocupacion-modal');
+    clearSelection();
+    loadCalendar();
+    loadAll();
+});
+
+async function eliminarSeleccion() {
+    if (!confirm(`¿Eliminar ${selectedDays.size} día(s)?`)) return;
+    for (const fecha of selectedDays) {
+        await fetch(`${BASE}/api/ocupacion/${selectedProperty}/${fecha}`, {method: 'DELETE'});
+    }
+    showToast('Eliminado');
+    closeModal('ocupacion-modal');
+    clearSelection();
+    loadCalendar();
+    loadAll();
+}
+
+function changeMonth(delta) {
+    currentMonth += delta;
+    if (currentMonth > 12) { currentMonth = 1; currentYear++; }
+    if (currentMonth < 1) { currentMonth = 12; currentYear--; }
+    clearSelection();
+    loadCalendar();
+}
+
+async function loadGastos() {
+    const res = await fetch(`${BASE}/api/gastos?year=${currentYear}`);
+    const gastos = await res.json();
+    document.getElementById('gastos-table').innerHTML = gastos.map(g => `
+        <tr>
+            <td>${g.fecha}</td>
+            <td>${g.propiedad_nombre || 'General'}</td>
+            <td>${g.categoria}</td>
+            <td>$${g.monto.toLocaleString()}</td>
+            <td>${g.descripcion || '-'}</td>
+            <td><button class="btn btn-danger" onclick="eliminarGasto(${g.id})" style="padding:5px 10px;font-size:0.8rem">🗑️</button></td>
+        </tr>
+    `).join('');
+}
+
+function openGastoModal() { document.getElementById('gasto-modal').classList.add('show'); }
+
+document.getElementById('gasto-form').addEventListener('submit', async (e) => {
+    e.preventDefault();
+    const res = await fetch(BASE + '/api/gastos', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({
+            fecha: document.getElementById('gasto-fecha').value,
+            propiedad_id: document.getElementById('gasto-propiedad').value || null,
+            categoria: document.getElementById('gasto-categoria').value,
+            monto: parseFloat(document.getElementById('gasto-monto').value),
+            descripcion: document.getElementById('gasto-descripcion').value
+        })
+    });
+    if (res.ok) {
+        showToast('Gasto guardado ✓');
+        closeModal('gasto-modal');
+        document.getElementById('gasto-form').reset();
+        document.getElementById('gasto-fecha').valueAsDate = new Date();
+        loadAll();
+    }
+});
+
+async function eliminarGasto(id) {
+    if (confirm('¿Eliminar?')) {
+        await fetch(`${BASE}/api/gasto/${id}`, {method: 'DELETE'});
+        showToast('Eliminado');
+        loadAll();
+    }
+}
+
+async function loadDashboard() {
+    // Cargar datos detallados para poder filtrar
+    const [resIng, resGast, resSum] = await Promise.all([
+        fetch(`${BASE}/api/ingresos-detalle/${currentYear}`),
+        fetch(`${BASE}/api/gastos-detalle/${currentYear}`),
+        fetch(`${BASE}/api/resumen/${currentYear}`)
+    ]);
+
+    dashboardRawData = {
+        ingresos: await resIng.json(),
+        gastos: await resGast.json(),
+        resumen: await resSum.json()
+    };
+
+    // Llenar selector de propiedades del dashboard
+    const selectProp = document.getElementById('dash-filter-prop');
+    const currentVal = selectProp.value;
+    selectProp.innerHTML = '<option value="">Todas</option>';
+    propiedades.forEach(p => {
+        selectProp.innerHTML += `<option value="${p.nombre}">${p.nombre}</option>`;
+    });
+    selectProp.value = currentVal;
+
+    applyDashboardFilters();
+}
+
+function applyDashboardFilters() {
+    if (!dashboardRawData) return;
+
+    const filterMes = document.getElementById('dash-filter-mes').value;
+    const filterProp = document.getElementById('dash-filter-prop').value;
+    const filterOrigen = document.getElementById('dash-filter-origen').value;
+
+    // Filtrar ingresos
+    let ingFiltrados = dashboardRawData.ingresos.filter(i => {
+        if (filterMes && i.mes !== filterMes) return false;
+        if (filterProp && i.propiedad !== filterProp) return false;
+        if (filterOrigen && i.origen !== filterOrigen) return false;
+        return true;
+    });
+
+    // Filtrar gastos
+    let gastFiltrados = dashboardRawData.gastos.filter(g => {
+        if (filterMes && g.mes !== filterMes) return false;
+        if (filterProp && g.propiedad !== filterProp && g.propiedad !== 'General') return false;
+        return true;
+    });
+
+    // Calcular totales
+    let totalIngresos = 0, totalNoches = 0, ingresosPorOrigen = {}, ingresosPorPropiedad = {};
+
+    ingFiltrados.forEach(i => {
+        totalIngresos += i.precio;
+        totalNoches += 1;
+        ingresosPorOrigen[i.origen] = (ingresosPorOrigen[i.origen] || 0) + i.precio;
+        ingresosPorPropiedad[i.propiedad] = (ingresosPorPropiedad[i.propiedad] || 0) + i.precio;
+    });
+
+    let totalGastos = gastFiltrados.reduce((sum, g) => sum + g.monto, 0);
+
+    // Calcular días del período para ocupación
+    let diasPeriodo = 365;
+    if (filterMes) {
+        const mes = parseInt(filterMes);
+        diasPeriodo = new Date(currentYear, mes, 0).getDate();
+    }
+
+    const propsTemporarias = filterProp ? 1 : (propiedades.filter(p => p.tipo === 'temporario').length || 5);
+    const pctOcupacion = ((totalNoches / (diasPeriodo * propsTemporarias)) * 100);
+
+    document.getElementById('kpi-ingresos').textContent = '$' + totalIngresos.toLocaleString();
+    document.getElementById('kpi-gastos').textContent = '$' + totalGastos.toLocaleString();
+    document.getElementById('kpi-rentabilidad').textContent = '$' + (totalIngresos - totalGastos).toLocaleString();
+    document.getElementById('kpi-noches').textContent = totalNoches;
+    document.getElementById('kpi-ocupacion').textContent = pctOcupacion.toFixed(1) + '% ocupación';
+
+    const ctx1 = document.getElementById('chart-ingresos').getContext('2d');
+    if (window.chartIngresos) window.chartIngresos.destroy();
+    window.chartIngresos = new Chart(ctx1, {
+        type: 'bar',
+        data: { labels: Object.keys(ingresosPorPropiedad), datasets: [{ data: Object.values(ingresosPorPropiedad), backgroundColor: ['#3498db','#e74c3c','#2ecc71','#9b59b6','#f39c12','#1abc9c','#e67e22','#34495e'] }] },
+        options: { plugins: { legend: { display: false } } }
+    });
+
+    const ctx2 = document.getElementById('chart-origen').getContext('2d');
+    if (window.chartOrigen) window.chartOrigen.destroy();
+    window.chartOrigen = new Chart(ctx2, {
+        type: 'doughnut',
+        data: { labels: Object.keys(ingresosPorOrigen), datasets: [{ data: Object.values(ingresosPorOrigen), backgroundColor: ['#2ecc71','#9b59b6','#f1c40f','#1abc9c'] }] }
+    });
+}
+
+function clearDashboardFilters() {
+    document.getElementById('dash-filter-mes').value = '';
+    document.getElementById('dash-filter-prop').value = '';
+    document.getElementById('dash-filter-origen').value = '';
+    applyDashboardFilters();
+}
+
+async function loadReportes() {
+    // Cargar ingresos detalle
+    const resIng = await fetch(`${BASE}/api/ingresos-detalle/${currentYear}`);
+    ingresosData = await resIng.json();
+    filtrarIngresos();
+
+    // Cargar gastos detalle
+    const resGast = await fetch(`${BASE}/api/gastos-detalle/${currentYear}`);
+    gastosData = await resGast.json();
+    filtrarGastosReporte();
+
+    // Cargar resumen
+    const resSum = await fetch(`${BASE}/api/resumen/${currentYear}`);
+    const data = await resSum.json();
+
+    const porProp = {};
+    const propsMensuales = new Set();
+
+    // Ingresos temporarios
+    data.ingresos.forEach(i => {
+        if (!porProp[i.nombre]) porProp[i.nombre] = { ing: 0, noches: 0, propio: 0, terceros: 0, tipo: i.tipo };
+        porProp[i.nombre].ing += i.total_ingresos;
+        porProp[i.nombre].noches += i.noches;
+        if (i.origen === 'Alquiler propio') porProp[i.nombre].propio += i.total_ingresos;
+        else porProp[i.nombre].terceros += i.total_ingresos;
+    });
+
+    // Ingresos mensuales
+    if (data.ingresos_mensuales) {
+        data.ingresos_mensuales.forEach(i => {
+            propsMensuales.add(i.nombre);
+            if (!porProp[i.nombre]) porProp[i.nombre] = { ing: 0, noches: 0, propio: 0, terceros: 0, tipo: 'mensual', meses: i.meses };
+            porProp[i.nombre].ing += i.total_ingresos;
+            porProp[i.nombre].meses = i.meses;
+        });
+    }
+
+    const gastosPorProp = {};
+    data.gastos.forEach(g => {
+        if (g.nombre) gastosPorProp[g.nombre] = (gastosPorProp[g.nombre] || 0) + g.total_gastos;
+    });
+
+    let html = '', totIng = 0, totGast = 0, totNoches = 0, totPropio = 0, totTerc = 0;
+    const rentPorProp = {};
+    let propsTemporarias = 0;
+
+    for (const [nombre, d] of Object.entries(porProp)) {
+        const gast = gastosPorProp[nombre] || 0;
+        const rent = d.ing - gast;
+        const esMensual = propsMensuales.has(nombre);
+        const ticket = d.noches > 0 ? d.ing / d.noches : (esMensual && d.meses > 0 ? d.ing / d.meses : 0);
+        const ocup = esMensual ? '-' : (d.noches / 365 * 100).toFixed(1) + '%';
+
+        rentPorProp[nombre] = rent;
+        totIng += d.ing; totGast += gast; 
+        if (!esMensual) {
+            totNoches += d.noches;
+            propsTemporarias++;
+        }
+        totPropio += d.propio; totTerc += d.terceros;
+
+        const nochesDisplay = esMensual ? `${d.meses || 0} meses` : d.noches;
+        const ticketLabel = esMensual ? `$${ticket.toFixed(0)}/mes` : `$${ticket.toFixed(0)}`;
+
+        html += `<tr>
+            <td>${nombre} ${esMensual ? '🏢' : ''}</td>
+            <td>$${d.ing.toLocaleString()}</td>
+            <td>$${gast.toLocaleString()}</td>
+            <td style="color:${rent >= 0 ? '#2ecc71' : '#e74c3c'}">$${rent.toLocaleString()}</td>
+            <td>${nochesDisplay}</td>
+            <td>${ocup}</td>
+            <td>${ticketLabel}</td>
+            <td>$${d.propio.toLocaleString()}</td>
+            <td>$${d.terceros.toLocaleString()}</td>
+        </tr>`;
+    }
+
+    const ocupProm = propsTemporarias > 0 ? (totNoches / (365 * propsTemporarias) * 100).toFixed(1) : 0;
+
+    html += `<tr class="total-row">
+        <td>TOTAL</td>
+        <td>$${totIng.toLocaleString()}</td>
+        <td>$${(totGast + data.gastos_generales).toLocaleString()}</td>
+        <td style="color:#2ecc71">$${(totIng - totGast - data.gastos_generales).toLocaleString()}</td>
+        <td>${totNoches} noches</td>
+        <td>${ocupProm}%</td>
+        <td>$${totNoches > 0 ? (totIng / totNoches).toFixed(0) : 0}</td>
+        <td>$${totPropio.toLocaleString()}</td>
+        <td>$${totTerc.toLocaleString()}</td>
+    </tr>`;
+
+    document.getElementById('resumen-table').innerHTML = html;
+
+    // Gráficos resumen
+    const ctx3 = document.getElementById('chart-rent').getContext('2d');
+    if (window.chartRent) window.chartRent.destroy();
+    window.chartRent = new Chart(ctx3, {
+        type: 'bar',
+        data: { labels: Object.keys(rentPorProp), datasets: [{ data: Object.values(rentPorProp), backgroundColor: Object.values(rentPorProp).map(v => v >= 0 ? '#2ecc71' : '#e74c3c') }] },
+        options: { plugins: { legend: { display: false } } }
+    });
+
+    const ctx4 = document.getElementById('chart-dist').getContext('2d');
+    if (window.chartDist) window.chartDist.destroy();
+    window.chartDist = new Chart(ctx4, {
+        type: 'doughnut',
+        data: { labels: Object.keys(porProp), datasets: [{ data: Object.values(porProp).map(p => p.ing), backgroundColor: ['#3498db','#e74c3c','#2ecc71','#9b59b6','#f39c12','#1abc9c','#e67e22','#34495e'] }] }
+    });
+}
+
+function filtrarIngresos() {
+    const prop = document.getElementById('filter-prop').value;
+    const origen = document.getElementById('filter-origen').value;
+    const mes = document.getElementById('filter-mes').value;
+
+    let filtered = ingresosData.filter(i => {
+        if (prop && i.propiedad !== prop) return false;
+        if (origen && i.origen !== origen) return false;
+        if (mes && i.mes !== mes) return false;
+        return true;
+    });
+
+    const total = filtered.reduce((a, b) => a + b.precio, 0);
+    const noches = filtered.length;
+
+    document.getElementById('sum-ingresos').textContent = '$' + total.toLocaleString();
+    document.getElementById('sum-noches').textContent = noches;
+    document.getElementById('sum-ticket').textContent = noches > 0 ? '$' + (total / noches).toFixed(0) : '$0';
+
+    document.getElementById('ingresos-table').innerHTML = filtered.map(i => `
+        <tr>
+            <td>${i.fecha}</td>
+            <td>${i.propiedad}</td>
+            <td>$${i.precio.toLocaleString()}</td>
+            <td><span class="badge badge-${i.origen.toLowerCase()}">${i.origen}</span></td>
+            <td>${i.notas || '-'}</td>
+        </tr>
+    `).join('');
+}
+
+function filtrarGastosReporte() {
+    const prop = document.getElementById('filter-gasto-prop').value;
+    const cat = document.getElementById('filter-gasto-cat').value;
+
+    let filtered = gastosData.filter(g => {
+        if (prop && g.propiedad !== prop) return false;
+        if (cat && g.categoria !== cat) return false;
+        return true;
+    });
+
+    const total = filtered.reduce((a, b) => a + b.monto, 0);
+    document.getElementById('sum-gastos').textContent = '$' + total.toLocaleString();
+
+    document.getElementById('gastos-reporte-table').innerHTML = filtered.map(g => `
+        <tr>
+            <td>${g.fecha}</td>
+            <td>${g.propiedad}</td>
+            <td>${g.categoria}</td>
+            <td>$${g.monto.toLocaleString()}</td>
+            <td>${g.descripcion || '-'}</td>
+        </tr>
+    `).join('');
+}
+
+function showTab(tabId) {
+    document.querySelectorAll('.tab-content').forEach(t => t.classList.remove('active'));
+    document.querySelectorAll('.tab').forEach(t => t.classList.remove('active'));
+    document.getElementById(tabId).classList.add('active');
+    event.target.classList.add('active');
+}
+
+function exportarExcel() {
+    // Abrir modal para seleccionar fechas
+    const year = document.getElementById('yearSelect').value;
+    document.getElementById('excel-desde').value = `${year}-01-01`;
+    document.getElementById('excel-hasta').value = `${year}-12-31`;
+
+    // Llenar selector de propiedades
+    const selectProp = document.getElementById('excel-propiedad');
+    selectProp.innerHTML = '<option value="">Todas</option>';
+    propiedades.forEach(p => {
+        selectProp.innerHTML += `<option value="${p.nombre}">${p.nombre}</option>`;
+    });
+
+    document.getElementById('excel-modal').classList.add('show');
+}
+
+function setExcelRangeYear() {
+    const year = document.getElementById('yearSelect').value;
+    document.getElementById('excel-desde').value = `${year}-01-01`;
+    document.getElementById('excel-hasta').value = `${year}-12-31`;
+}
+
+document.getElementById('excel-form').addEventListener('submit', (e) => {
+    e.preventDefault();
+    const desde = document.getElementById('excel-desde').value;
+    const hasta = document.getElementById('excel-hasta').value;
+    const propiedad = document.getElementById('excel-propiedad').value;
+
+    let url = `${BASE}/api/exportar/excel?desde=${desde}&hasta=${hasta}`;
+    if (propiedad) url += `&propiedad=${encodeURIComponent(propiedad)}`;
+
+    window.location.href = url;
+    showToast('Descargando Excel...');
+    closeModal('excel-modal');
+});
+
+function abrirPresentacion() {
+    window.open(`${BASE}/api/presentacion/${currentYear}`, '_blank');
+}
+
+function showSection(section) {
+    document.querySelectorAll('.section').forEach(s => s.classList.remove('active'));
+    document.getElementById(section).classList.add('active');
+    document.querySelectorAll('.nav-item').forEach(n => n.classList.remove('active'));
+    event.target.classList.add('active');
+    if (section === 'gastos') loadGastos();
+    if (section === 'reportes') loadReportes();
+    if (section === 'calendario-general') loadCalendarioGeneral();
+}
+
+function closeModal(id) { document.getElementById(id).classList.remove('show'); }
+
+function showToast(msg, type = 'success') {
+    const toast = document.getElementById('toast');
+    toast.textContent = msg;
+    toast.className = 'toast show' + (type === 'error' ? ' error' : '');
+    setTimeout(() => toast.classList.remove('show'), 3000);
+}
+
+document.querySelectorAll('.modal').forEach(modal => {
+    modal.addEventListener('click', (e) => { if (e.target === modal) modal.classList.remove('show'); });
+});
+
+// === CALENDARIO GENERAL ===
+let generalYear = 2025;
+let generalMonth = 12;
+const DEPTOS_TIDES = ['TIDES 14 B', 'TIDES 5 L', 'TIDES 10 L', 'TIDES 10 F', 'TIDES 12 F'];
+
+function changeMonthGeneral(delta) {
+    generalMonth += delta;
+    if (generalMonth > 12) { generalMonth = 1; generalYear++; }
+    if (generalMonth < 1) { generalMonth = 12; generalYear--; }
+    clearSelectionGeneral();
+    loadCalendarioGeneral();
+}
+
+// Selección en calendario general
+let selectedCellsGeneral = [];
+
+function toggleSelectGeneral(cell) {
+    const fecha = cell.dataset.fecha;
+    const prop = cell.dataset.prop;
+    const propId = cell.dataset.propid;
+    const key = `${prop}-${fecha}`;
+
+    const idx = selectedCellsGeneral.findIndex(s => s.key === key);
+    if (idx >= 0) {
+        selectedCellsGeneral.splice(idx, 1);
+        cell.classList.remove('selected');
+    } else {
+        selectedCellsGeneral.push({ key, fecha, prop, propId });
+        cell.classList.add('selected');
+    }
+    updateSelectionBarGeneral();
+}
+
+function updateSelectionBarGeneral() {
+    const bar = document.getElementById('selection-bar-general');
+    const count = document.getElementById('selected-count-general');
+    const btnCargar = document.getElementById('btn-cargar-general');
+    const btnEliminar = document.getElementById('btn-eliminar-general');
+
+    const totalLibres = selectedCellsGeneral.length;
+    const totalRangos = selectedRangos.length;
+    let totalDiasOcupados = 0;
+    selectedRangos.forEach(r => totalDiasOcupados += r.fechas.length);
+
+    if (totalLibres > 0 || totalRangos > 0) {
+        bar.style.display = 'flex';
+
+        // Mostrar resumen
+        let texto = '';
+        if (totalLibres > 0) texto += `${totalLibres} días libres`;
+        if (totalLibres > 0 && totalRangos > 0) texto += ' + ';
+        if (totalRangos > 0) texto += `${totalRangos} alquiler(es) (${totalDiasOcupados} días)`;
+        count.textContent = texto;
+
+        // Mostrar botones según tipo de selección
+        btnCargar.style.display = totalLibres > 0 ? 'inline-block' : 'none';
+        btnEliminar.style.display = totalRangos > 0 ? 'inline-block' : 'none';
+    } else {
+        bar.style.display = 'none';
+    }
+}
+
+function clearSelectionGeneral() {
+    selectedCellsGeneral = [];
+    selectedRangos = [];
+    document.querySelectorAll('#tabla-general td.selected').forEach(c => c.classList.remove('selected'));
+    updateSelectionBarGeneral();
+}
+
+// Selección de rangos ocupados (alquileres completos)
+let selectedRangos = [];
+
+function toggleSelectRango(cell, rangoDataEncoded) {
+    const rangoData = JSON.parse(decodeURIComponent(rangoDataEncoded));
+    const key = `${rangoData.prop}-${rangoData.fechas[0]}`;
+
+    const idx = selectedRangos.findIndex(r => r.key === key);
+    if (idx >= 0) {
+        selectedRangos.splice(idx, 1);
+        cell.classList.remove('selected');
+    } else {
+        selectedRangos.push({ 
+            key, 
+            propId: rangoData.propId, 
+            prop: rangoData.prop,
+            fechas: rangoData.fechas,
+            inquilino: rangoData.inquilino,
+            origen: rangoData.origen
+        });
+        cell.classList.add('selected');
+    }
+    updateSelectionBarGeneral();
+}
+
+async function eliminarSeleccionGeneral() {
+    if (selectedRangos.length === 0) return;
+
+    // Contar total de días
+    let totalDias = 0;
+    selectedRangos.forEach(r => totalDias += r.fechas.length);
+
+    if (!confirm(`¿Seguro que querés eliminar ${selectedRangos.length} alquiler(es) (${totalDias} días en total)?`)) return;
+
+    for (const rango of selectedRangos) {
+        for (const fecha of rango.fechas) {
+            await fetch(`${BASE}/api/ocupacion/${rango.propId}/${fecha}`, { method: 'DELETE' });
+        }
+    }
+
+    showToast(`Se eliminaron ${totalDias} días`, 'success');
+    clearSelectionGeneral();
+    loadCalendarioGeneral();
+    loadAll();
+}
+
+function openMultiModalGeneral() {
+    if (selectedCellsGeneral.length === 0) return;
+
+    // Agrupar por propiedad
+    const grouped = {};
+    selectedCellsGeneral.forEach(s => {
+        if (!grouped[s.prop]) grouped[s.prop] = { propId: s.propId, fechas: [] };
+        grouped[s.prop].fechas.push(s.fecha);
+    });
+
+    // Mostrar resumen
+    const props = Object.keys(grouped);
+    let resumen = `<strong>Se cargarán ${selectedCellsGeneral.length} días:</strong><br>`;
+    props.forEach(p => {
+        const fechas = grouped[p].fechas.sort();
+        resumen += `• ${p}: ${fechas.length} noches<br>`;
+    });
+
+    document.getElementById('multi-resumen').innerHTML = resumen;
+
+    // Limpiar formulario (mantener origen como "Alquiler propio")
+    document.getElementById('multi-precio').value = '';
+    document.getElementById('multi-notas').value = '';
+    document.getElementById('multi-origen').value = 'Alquiler propio';
+
+    document.getElementById('multi-general-modal').classList.add('show');
+
+    // Guardar info para submit
+    window.pendingMultiGeneral = grouped;
+}
+
+async function submitMultiGeneral() {
+    const precio = parseFloat(document.getElementById('multi-precio').value);
+    const origen = document.getElementById('multi-origen').value || 'Alquiler propio';
+    const notas = document.getElementById('multi-notas').value;
+
+    if (!precio || precio <= 0) { showToast('Ingresá un precio válido', 'error'); return; }
+
+    const noches = [];
+    for (const prop of Object.keys(window.pendingMultiGeneral)) {
+        const data = window.pendingMultiGeneral[prop];
+        data.fechas.forEach(fecha => noches.push({ propiedad_id: data.propId, fecha }));
+    }
+
+    const res = await fetch(BASE + '/api/ocupaciones/lote', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ noches, precio, origen, notas })
+    });
+    const result = await res.json();
+    if (!result.success) { showToast(result.error || 'Error al guardar', 'error'); return; }
+
+    document.getElementById('multi-general-modal').classList.remove('show');
+    clearSelectionGeneral();
+    loadCalendarioGeneral();
+    loadAll();
+    showToast(`Se cargaron ${result.noches} noches correctamente`, 'success');
+}
+
+async function loadCalendarioGeneral() {
+    const monthNames = ['','Enero','Febrero','Marzo','Abril','Mayo','Junio','Julio','Agosto','Septiembre','Octubre','Noviembre','Diciembre'];
+    document.getElementById('calendar-month-general').textContent = `${monthNames[generalMonth]} ${generalYear}`;
+
+    // Obtener ocupaciones del mes
+    const res = await fetch(`${BASE}/api/ocupaciones/${generalYear}/${generalMonth}`);
+    const ocupaciones = await res.json();
+
+    // Crear mapa de ocupaciones
+    const ocupMap = {};
+    ocupaciones.forEach(o => {
+        const key = `${o.propiedad_nombre}-${o.fecha}`;
+        ocupMap[key] = o;
+    });
+
+    // Obtener días del mes
+    const diasEnMes = new Date(generalYear, generalMonth, 0).getDate();
+
+    // Crear header
+    let headerHtml = '<tr><th style="min-width:100px">Propiedad</th>';
+    for (let d = 1; d <= diasEnMes; d++) {
+        const fecha = new Date(generalYear, generalMonth - 1, d);
+        const diaSemana = ['D','L','M','X','J','V','S'][fecha.getDay()];
+        headerHtml += `<th class="dia-header">${d}<br><small>${diaSemana}</small></th>`;
+    }
+    headerHtml += '</tr>';
+    document.getElementById('tabla-general-header').innerHTML = headerHtml;
+
+    // Crear filas por cada departamento con celdas combinadas
+    let bodyHtml = '';
+    DEPTOS_TIDES.forEach(depto => {
+        const propId = propiedades.find(p => p.nombre === depto)?.id;
+        bodyHtml += `<tr><td class="prop-name">${depto}</td>`;
+
+        let d = 1;
+        while (d <= diasEnMes) {
+            const fechaStr = `${generalYear}-${String(generalMonth).padStart(2,'0')}-${String(d).padStart(2,'0')}`;
+            const key = `${depto}-${fechaStr}`;
+            const ocup = ocupMap[key];
+
+            if (!ocup) {
+                // Celda libre - clickeable
+                bodyHtml += `<td class="dia-cell libre" data-fecha="${fechaStr}" data-prop="${depto}" data-propid="${propId}" onclick="toggleSelectGeneral(this)" title="Click para cargar"><span style="font-size:0.65rem;font-weight:600">LIBRE</span></td>`;
+                d++;
+            } else {
+                // Celda ocupada - buscar cuántos días seguidos tiene el mismo inquilino
+                const inquilinoActual = ocup.notas || '';
+                const origenActual = ocup.origen || '';
+                let colspan = 1;
+                let precioTotal = ocup.precio || 0;
+
+                // Buscar días consecutivos con mismo inquilino y origen
+                for (let siguiente = d + 1; siguiente <= diasEnMes; siguiente++) {
+                    const fechaSig = `${generalYear}-${String(generalMonth).padStart(2,'0')}-${String(siguiente).padStart(2,'0')}`;
+                    const keySig = `${depto}-${fechaSig}`;
+                    const ocupSig = ocupMap[keySig];
+
+                    if (ocupSig && ocupSig.notas === inquilinoActual && ocupSig.origen === origenActual) {
+                        colspan++;
+                        precioTotal += ocupSig.precio || 0;
+                    } else {
+                        break;
+                    }
+                }
+
+                const origenLower = origenActual.toLowerCase();
+                let clase = 'dia-cell ocupado';
+                let origenTexto = origenActual.toUpperCase();
+
+                if (origenLower === 'alquiler propio') {
+                    clase = 'dia-cell ocupado-dueño';
+                } else if (origenLower === 'alicia') {
+                    clase = 'dia-cell ocupado-alicia';
+                } else if (origenLower === 'estanislao') {
+                    clase = 'dia-cell ocupado-estanislao';
+                }
+
+                const titulo = `${origenActual}: ${inquilinoActual || 'Sin nombre'} - $${precioTotal} (${colspan} noches)`;
+                const precioPorNoche = ocup.precio || 0;
+                const contenido = `<div class="celda-info-merged">
+                    <span class="merged-inquilino">${inquilinoActual || origenTexto}</span>
+                    <span class="merged-detalle">${origenTexto} · ${colspan} noches x $${precioPorNoche}</span>
+                </div>`;
+
+                // Guardar todas las fechas del rango para eliminar
+                const fechasRango = [];
+                for (let i = 0; i < colspan; i++) {
+                    const diaRango = d + i;
+                    fechasRango.push(`${generalYear}-${String(generalMonth).padStart(2,'0')}-${String(diaRango).padStart(2,'0')}`);
+                }
+                const rangoData = encodeURIComponent(JSON.stringify({
+                    propId: propId,
+                    prop: depto,
+                    fechas: fechasRango,
+                    inquilino: inquilinoActual,
+                    origen: origenActual
+                }));
+
+                bodyHtml += `<td class="${clase}" colspan="${colspan}" title="${titulo}" style="cursor:pointer" data-ocupado="true" onclick="toggleSelectRango(this, '${rangoData}')">${contenido}</td>`;
+                d += colspan;
+            }
+        }
+        bodyHtml += '</tr>';
+    });
+
+    document.getElementById('tabla-general-body').innerHTML = bodyHtml;
+}
+
+// === IMPORTAR EXCEL ===
+let importOrigen = null;
+
+function openImportModal() {
+    document.getElementById('import-file').value = '';
+    document.getElementById('import-result').style.display = 'none';
+    document.querySelectorAll('#import-modal .origen-btn').forEach(b => b.classList.remove('selected'));
+    importOrigen = null;
+    document.getElementById('import-modal').classList.add('show');
+}
+
+function selectImportOrigen(btn) {
+    document.querySelectorAll('#import-modal .origen-btn').forEach(b => b.classList.remove('selected'));
+    btn.classList.add('selected');
+    importOrigen = btn.dataset.origen;
+}
+
+document.getElementById('import-form').addEventListener('submit', async (e) => {
+    e.preventDefault();
+
+    if (!importOrigen) {
+        showToast('Seleccioná quién cargó los alquileres', 'error');
+        return;
+    }
+
+    const fileInput = document.getElementById('import-file');
+    if (!fileInput.files.length) {
+        showToast('Seleccioná un archivo', 'error');
+        return;
+    }
+
+    const formData = new FormData();
+    formData.append('file', fileInput.files[0]);
+    formData.append('origen', importOrigen);
+
+    try {
+        const res = await fetch(BASE + '/api/importar-excel', {
+            method: 'POST',
+            body: formData
+        });
+
+        const data = await res.json();
+
+        const resultDiv = document.getElementById('import-result');
+        const resultContent = document.getElementById('import-result-content');
+
+        if (data.success) {
+            document.getElementById('import-result-title').textContent = '✅ Importación exitosa';
+            let html = `<div class="summary-row"><span class="summary-label">Registros importados:</span><span class="summary-value positive">${data.importados}</span></div>`;
+
+            if (data.errores && data.errores.length > 0) {
+                html += `<div style="margin-top:15px;color:#e74c3c"><strong>⚠️ Errores (${data.errores.length}):</strong><ul style="margin-top:5px;padding-left:20px">`;
+                data.errores.slice(0, 5).forEach(err => {
+                    html += `<li style="font-size:0.85rem">${err}</li>`;
+                });
+                if (data.errores.length > 5) html += `<li>...y ${data.errores.length - 5} más</li>`;
+                html += '</ul></div>';
+            }
+
+            resultContent.innerHTML = html;
+            showToast(`${data.importados} registros importados ✓`);
+            loadAll();
+        } else {
+            document.getElementById('import-result-title').textContent = '❌ Error';
+            resultContent.innerHTML = `<div style="color:#e74c3c">${data.error}</div>`;
+            showToast('Error al importar', 'error');
+        }
+
+        resultDiv.style.display = 'block';
+    } catch (err) {
+        showToast('Error de conexión', 'error');
+    }
+});
+
+// === ALQUILERES MENSUALES ===
+
+async function loadAlquileresMensuales() {
+    const year = document.getElementById('mensual-year').value;
+    const res = await fetch(`${BASE}/api/alquileres-mensuales/${year}`);
+    const data = await res.json();
+
+    // Filtrar por la propiedad seleccionada
+    alquileresMensualesData = data.filter(a => a.propiedad_id === selectedProperty);
+
+    let total = 0;
+    let html = '';
+
+    // Crear una fila por cada mes cargado
+    for (let mes = 1; mes <= 12; mes++) {
+        const alquiler = alquileresMensualesData.find(a => a.mes === mes);
+        if (alquiler) {
+            total += alquiler.monto;
+            html += `<tr>
+                <td>${MESES[mes]}</td>
+                <td style="color:#2ecc71;font-weight:600">$${alquiler.monto.toLocaleString()}</td>
+                <td>${alquiler.notas || '-'}</td>
+                <td>
+                    <button class="btn btn-danger" onclick="eliminarAlquilerMensual(${mes})" style="padding:5px 10px;font-size:0.8rem">🗑️</button>
+                </td>
+            </tr>`;
+        } else {
+            html += `<tr style="opacity:0.5">
+                <td>${MESES[mes]}</td>
+                <td>-</td>
+                <td>-</td>
+                <td>
+                    <button class="btn btn-secondary" onclick="openMensualModalForMonth(${mes})" style="padding:5px 10px;font-size:0.8rem">+ Agregar</button>
+                </td>
+            </tr>`;
+        }
+    }
+
+    document.getElementById('mensual-table').innerHTML = html;
+    document.getElementById('mensual-total').textContent = '$' + total.toLocaleString();
+    document.getElementById('mensual-meses').textContent = alquileresMensualesData.length + ' de 12';
+}
+
+function openMensualModal() {
+    document.getElementById('mensual-mes').value = new Date().getMonth() + 1;
+    document.getElementById('mensual-monto').value = '';
+    document.getElementById('mensual-notas').value = '';
+    document.getElementById('mensual-modal').classList.add('show');
+}
+
+function openMensualModalForMonth(mes) {
+    document.getElementById('mensual-mes').value = mes;
+    document.getElementById('mensual-monto').value = '';
+    document.getElementById('mensual-notas').value = '';
+    document.getElementById('mensual-modal').classList.add('show');
+}
+
+document.getElementById('mensual-form').addEventListener('submit', async (e) => {
+    e.preventDefault();
+    const year = parseInt(document.getElementById('mensual-year').value);
+    const mes = parseInt(document.getElementById('mensual-mes').value);
+    const monto = parseFloat(document.getElementById('mensual-monto').value);
+    const notas = document.getElementById('mensual-notas').value;
+
+    const res = await fetch(BASE + '/api/alquiler-mensual', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({ propiedad_id: selectedProperty, año: year, mes, monto, notas })
+    });
+
+    if (res.ok) {
+        showToast('Alquiler guardado ✓');
+        closeModal('mensual-modal');
+        loadAlquileresMensuales();
+        loadAll();
+    }
+});
+
+async function eliminarAlquilerMensual(mes) {
+    if (!confirm(`¿Eliminar ${MESES[mes]}?`)) return;
+    const anio = document.getElementById('mensual-year').value;
+    await fetch(`${BASE}/api/alquiler-mensual/${selectedProperty}/${anio}/${mes}`, {method: 'DELETE'});
+    showToast('Eliminado');
+    loadAlquileresMensuales();
+    loadAll();
+}
@@ -0,0 +1,361 @@
+const DEPTOS_TIDES = ['TIDES 14 B', 'TIDES 5 L', 'TIDES 10 L', 'TIDES 10 F', 'TIDES 12 F'];
+
+let currentYear = new Date().getFullYear();
+let currentMonth = new Date().getMonth() + 1;
+let propiedades = [];
+let selectedCells = [];
+
+// Inicializar
+document.addEventListener('DOMContentLoaded', async () => {
+    await loadPropiedades();
+    loadCalendario();
+});
+
+async function loadPropiedades() {
+    const res = await fetch(BASE + '/api/propiedades');
+    propiedades = await res.json();
+}
+
+function showTab(tab) {
+    document.querySelectorAll('.tab').forEach(t => t.classList.remove('active'));
+    document.querySelectorAll('.tab-content').forEach(t => t.classList.remove('active'));
+
+    const tabIndex = tab === 'calendario' ? 0 : (tab === 'cargar' ? 1 : 2);
+    document.querySelectorAll('.tab')[tabIndex].classList.add('active');
+    document.getElementById('tab-' + tab).classList.add('active');
+
+    if (tab === 'mis') cargarMisCargas();
+    if (tab === 'calendario') loadCalendario();
+}
+
+function changeMonth(delta) {
+    currentMonth += delta;
+    if (currentMonth > 12) { currentMonth = 1; currentYear++; }
+    if (currentMonth < 1) { currentMonth = 12; currentYear--; }
+    clearSelection();
+    loadCalendario();
+}
+
+async function loadCalendario() {
+    const monthNames = ['','Enero','Febrero','Marzo','Abril','Mayo','Junio','Julio','Agosto','Septiembre','Octubre','Noviembre','Diciembre'];
+    document.getElementById('calendar-month').textContent = `${monthNames[currentMonth]} ${currentYear}`;
+
+    const res = await fetch(`${BASE}/api/ocupaciones/${currentYear}/${currentMonth}`);
+    const ocupaciones = await res.json();
+
+    // Crear mapa de ocupaciones
+    const ocupMap = {};
+    ocupaciones.forEach(o => {
+        const key = `${o.propiedad_nombre}-${o.fecha}`;
+        ocupMap[key] = o;
+    });
+
+    const diasEnMes = new Date(currentYear, currentMonth, 0).getDate();
+
+    // Header
+    let headerHtml = '<tr><th style="min-width:100px">Propiedad</th>';
+    for (let d = 1; d <= diasEnMes; d++) {
+        const fecha = new Date(currentYear, currentMonth - 1, d);
+        const diaSemana = ['D','L','M','X','J','V','S'][fecha.getDay()];
+        headerHtml += `<th class="dia-header">${d}<br><small>${diaSemana}</small></th>`;
+    }
+    headerHtml += '</tr>';
+    document.getElementById('tabla-general-header').innerHTML = headerHtml;
+
+    // Body
+    let bodyHtml = '';
+    DEPTOS_TIDES.forEach(depto => {
+        const propId = propiedades.find(p => p.nombre === depto)?.id;
+        bodyHtml += `<tr><td class="prop-name">${depto}</td>`;
+
+        let d = 1;
+        while (d <= diasEnMes) {
+            const fechaStr = `${currentYear}-${String(currentMonth).padStart(2,'0')}-${String(d).padStart(2,'0')}`;
+            const key = `${depto}-${fechaStr}`;
+            const ocup = ocupMap[key];
+
+            if (!ocup) {
+                bodyHtml += `<td class="dia-cell libre" data-fecha="${fechaStr}" data-prop="${depto}" data-propid="${propId}" onclick="toggleSelect(this)"><span style="font-size:0.65rem;font-weight:600">LIBRE</span></td>`;
+                d++;
+            } else {
+                const inquilinoActual = ocup.notas || '';
+                const origenActual = ocup.origen || '';
+                let colspan = 1;
+
+                for (let siguiente = d + 1; siguiente <= diasEnMes; siguiente++) {
+                    const fechaSig = `${currentYear}-${String(currentMonth).padStart(2,'0')}-${String(siguiente).padStart(2,'0')}`;
+                    const keySig = `${depto}-${fechaSig}`;
+                    const ocupSig = ocupMap[keySig];
+
+                    if (ocupSig && ocupSig.notas === inquilinoActual && ocupSig.origen === origenActual) {
+                        colspan++;
+                    } else {
+                        break;
+                    }
+                }
+
+                const origenLower = origenActual.toLowerCase();
+                let clase = 'dia-cell ocupado';
+                let origenTexto = origenActual.toUpperCase();
+
+                if (origenLower === 'alquiler propio') {
+                    clase = 'dia-cell ocupado-dueño';
+                } else if (origenLower === 'alicia') {
+                    clase = 'dia-cell ocupado-alicia';
+                } else if (origenLower === 'estanislao') {
+                    clase = 'dia-cell ocupado-estanislao';
+                }
+
+                const precioPorNoche = ocup.precio || 0;
+                const contenido = `<div class="celda-info-merged">
+                    <span class="merged-inquilino">${inquilinoActual || origenTexto}</span>
+                    <span class="merged-detalle">${origenTexto} · ${colspan} noches x $${precioPorNoche}</span>
+                </div>`;
+
+                bodyHtml += `<td class="${clase}" colspan="${colspan}" title="${inquilinoActual || origenActual}">${contenido}</td>`;
+                d += colspan;
+            }
+        }
+        bodyHtml += '</tr>';
+    });
+
+    document.getElementById('tabla-general-body').innerHTML = bodyHtml;
+}
+
+// Selección de celdas
+function toggleSelect(cell) {
+    const fecha = cell.dataset.fecha;
+    const prop = cell.dataset.prop;
+    const propId = cell.dataset.propid;
+    const key = `${prop}-${fecha}`;
+
+    const idx = selectedCells.findIndex(s => s.key === key);
+    if (idx >= 0) {
+        selectedCells.splice(idx, 1);
+        cell.classList.remove('selected');
+    } else {
+        selectedCells.push({ key, fecha, prop, propId });
+        cell.classList.add('selected');
+    }
+    updateSelectionBar();
+}
+
+function updateSelectionBar() {
+    const bar = document.getElementById('selection-bar');
+    const count = document.getElementById('selected-count');
+
+    if (selectedCells.length > 0) {
+        bar.style.display = 'flex';
+        count.textContent = selectedCells.length;
+    } else {
+        bar.style.display = 'none';
+    }
+}
+
+function clearSelection() {
+    selectedCells = [];
+    document.querySelectorAll('#tabla-general td.selected').forEach(c => c.classList.remove('selected'));
+    updateSelectionBar();
+}
+
+function openMultiModal() {
+    if (selectedCells.length === 0) return;
+
+    const grouped = {};
+    selectedCells.forEach(s => {
+        if (!grouped[s.prop]) grouped[s.prop] = { propId: s.propId, fechas: [] };
+        grouped[s.prop].fechas.push(s.fecha);
+    });
+
+    const props = Object.keys(grouped);
+    let resumen = `<strong>Se cargarán ${selectedCells.length} días como ${ORIGEN}:</strong><br>`;
+    props.forEach(p => {
+        const fechas = grouped[p].fechas.sort();
+        resumen += `• ${p}: ${fechas.length} noches<br>`;
+    });
+
+    document.getElementById('multi-resumen').innerHTML = resumen;
+    document.getElementById('multi-precio').value = '';
+    document.getElementById('multi-notas').value = '';
+    document.getElementById('multi-modal').classList.add('show');
+
+    window.pendingMulti = grouped;
+}
+
+async function submitMulti() {
+    const precio = parseFloat(document.getElementById('multi-precio').value);
+    const notas = document.getElementById('multi-notas').value;
+
+    if (!precio || precio <= 0) { showToast('Ingresá un precio válido', 'error'); return; }
+    if (!notas.trim()) { showToast('Ingresá el nombre del inquilino', 'error'); return; }
+
+    const noches = [];
+    for (const prop of Object.keys(window.pendingMulti)) {
+        const data = window.pendingMulti[prop];
+        data.fechas.forEach(fecha => noches.push({ propiedad_id: data.propId, fecha }));
+    }
+
+    const res = await fetch(BASE + '/api/ocupaciones/lote', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ noches, precio, origen: ORIGEN, notas })
+    });
+    const result = await res.json();
+    if (!result.success) { showToast(result.error || 'Error al guardar', 'error'); return; }
+
+    closeModal('multi-modal');
+    clearSelection();
+    loadCalendario();
+    showToast(`Se cargaron ${result.noches} noches correctamente`, 'success');
+}
+
+// Formulario nueva carga
+document.getElementById('cargar-form').addEventListener('submit', async (e) => {
+    e.preventDefault();
+
+    const propiedad = document.getElementById('propiedad').value;
+    const fechaInicio = document.getElementById('fecha-inicio').value;
+    const fechaFin = document.getElementById('fecha-fin').value;
+    const precio = parseFloat(document.getElementById('precio').value);
+    const inquilino = document.getElementById('inquilino').value;
+
+    const res = await fetch(BASE + '/api/cargar-externo', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            propiedad: propiedad,
+            fecha_inicio: fechaInicio,
+            fecha_fin: fechaFin,
+            precio: precio,
+            inquilino: inquilino,
+            origen: ORIGEN
+        })
+    });
+
+    const result = await res.json();
+
+    if (result.success) {
+        showToast(`Se cargaron ${result.dias} noche(s)`);
+        document.getElementById('cargar-form').reset();
+        loadCalendario();
+    } else {
+        showToast(result.error || 'Error al guardar', 'error');
+    }
+});
+
+// Mis cargas
+async function cargarMisCargas() {
+    const res = await fetch(BASE + '/api/mis-cargas/' + ORIGEN);
+    const cargas = await res.json();
+    const lista = document.getElementById('lista-cargas');
+
+    if (cargas.length === 0) {
+        lista.innerHTML = '<div class="empty">No tenés cargas todavía</div>';
+        return;
+    }
+
+    lista.innerHTML = cargas.map(c => `
+        <div class="carga-item">
+            <div class="carga-info">
+                <span class="prop">${c.propiedad}</span>
+                <span class="fecha">${c.fecha}</span>
+                <div class="inq">👤 ${c.notas || 'Sin nombre'}</div>
+            </div>
+            <span class="carga-precio">$${c.precio}</span>
+            <div class="carga-actions">
+                <button class="btn btn-edit btn-sm" title="Editar esta noche" onclick="editarCarga(${c.id}, ${c.precio}, '${(c.notas || '').replace(/'/g, "\\'")}', '${c.fecha}')">✏️</button>
+                <button class="btn btn-danger btn-sm" title="Borrar esta noche" onclick="borrarCarga(${c.id})">🗑️</button>
+                ${c.noches_grupo > 1 ? `
+                <button class="btn btn-edit btn-sm" title="Editar las ${c.noches_grupo} noches de la estadía" onclick="editarEstadia('${c.grupo}', ${c.precio}, '${(c.notas || '').replace(/'/g, "\\'")}', ${c.noches_grupo})">✏️ Estadía (${c.noches_grupo})</button>
+                <button class="btn btn-danger btn-sm" title="Borrar las ${c.noches_grupo} noches de la estadía" onclick="borrarEstadia('${c.grupo}', ${c.noches_grupo})">🗑️ Estadía (${c.noches_grupo})</button>` : ''}
+            </div>
+        </div>
+    `).join('');
+}
+
+function editarCarga(id, precio, inquilino, fecha) {
+    document.getElementById('edit-id').value = id;
+    document.getElementById('edit-form').dataset.grupo = '';
+    document.getElementById('edit-titulo').textContent = '✏️ Editar noche';
+    document.getElementById('edit-alcance').textContent = 'Se modifica solo la noche del ' + fecha;
+    document.getElementById('edit-precio').value = precio;
+    document.getElementById('edit-inquilino').value = inquilino;
+    document.getElementById('modal-edit').classList.add('show');
+}
+
+function editarEstadia(grupo, precio, inquilino, noches) {
+    document.getElementById('edit-id').value = '';
+    document.getElementById('edit-form').dataset.grupo = grupo;
+    document.getElementById('edit-titulo').textContent = '✏️ Editar estadía completa';
+    document.getElementById('edit-alcance').textContent = 'Se modifican las ' + noches + ' noches de la estadía';
+    document.getElementById('edit-precio').value = precio;
+    document.getElementById('edit-inquilino').value = inquilino;
+    document.getElementById('modal-edit').classList.add('show');
+}
+
+document.getElementById('edit-form').addEventListener('submit', async (e) => {
+    e.preventDefault();
+    const id = document.getElementById('edit-id').value;
+    const grupo = document.getElementById('edit-form').dataset.grupo;
+    // Con grupo (editarEstadia) se modifica la estadía completa en un solo request
+    const url = BASE + (grupo ? '/api/modificar-carga-grupo/' + grupo : '/api/modificar-carga/' + id);
+    const res = await fetch(url, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            precio: parseFloat(document.getElementById('edit-precio').value),
+            inquilino: document.getElementById('edit-inquilino').value,
+            origen: ORIGEN
+        })
+    });
+    const data = await res.json();
+    if (data.success) {
+        closeModal('modal-edit');
+        cargarMisCargas();
+        loadCalendario();
+        showToast('Carga actualizada');
+    } else {
+        showToast(data.error || 'Error al modificar', 'error');
+    }
+});
+
+async function borrarCarga(id) {
+    if (!confirm('¿Seguro que querés borrar esta carga?')) return;
+    const res = await fetch(BASE + '/api/borrar-carga/' + id + '/' + ORIGEN, { method: 'DELETE' });
+    const data = await res.json();
+    if (data.success) {
+        cargarMisCargas();
+        loadCalendario();
+        showToast('Carga eliminada');
+    } else {
+        showToast(data.error || 'Error al borrar', 'error');
+    }
+}
+
+async function borrarEstadia(grupo, noches) {
+    if (!confirm('¿Seguro que querés borrar las ' + noches + ' noches de esta estadía?')) return;
+    const res = await fetch(BASE + '/api/borrar-carga-grupo/' + grupo + '/' + ORIGEN, { method: 'DELETE' });
+    const data = await res.json();
+    if (data.success) {
+        cargarMisCargas();
+        loadCalendario();
+        showToast('Estadía eliminada (' + data.noches + ' noches)');
+    } else {
+        showToast(data.error || 'Error al borrar', 'error');
+    }
+}
+
+function closeModal(id) {
+    document.getElementById(id).classList.remove('show');
+}
+
+function showToast(msg, type = 'success') {
+    const toast = document.getElementById('toast');
+    toast.textContent = msg;
+    toast.className = 'toast show' + (type === 'error' ? ' error' : '');
+    setTimeout(() => toast.classList.remove('show'), 3000);
+}
+
+document.querySelectorAll('.modal').forEach(modal => {
+    modal.addEventListener('click', (e) => { if (e.target === modal) modal.classList.remove('show'); });
+});